@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# 프로젝트 루트를 Python 경로에 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.vector_db import FaissClient, vector_store, post_vectors
+
+# (index_type, 옵션, 질의 파라미터 목록)
+CONFIGS = [
+    ("ivf",   {}, [{"nprobe" : n} for n in (1, 4, 16, 64)]),
+    ("ivfpq", {}, [{"nprobe" : n, "k_factor" : f} for n in (4, 16, 64) for f in (1, 4, 8)]),
+    ("hnsw",  {}, [{"ef_search" : ef} for ef in (16, 64, 256)]),
+]
+
+def load_vectors(synthetic : int, dim : int = 768) -> tuple[np.ndarray, np.ndarray] :
+    """저장된 게시글 벡터를 쓰고, 부족하면 군집 구조를 가진 합성 벡터 사용"""
+    if not synthetic :
+        vector_store.load()
+        if len(post_vectors) > 0 :
+            return post_vectors.ids(), np.array(post_vectors.vectors())
+        print("저장된 게시글 벡터가 없어 합성 벡터 10000개 사용")
+        synthetic = 10000
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, synthetic // 100), dim)).astype("float32")
+    labels = rng.integers(0, len(centers), synthetic)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((synthetic, dim)).astype("float32")
+    return np.arange(synthetic, dtype = "int64"), vectors.astype("float32")
+
+def build_client(index_type : str, ids : np.ndarray, vectors : np.ndarray, metric : str, **options) -> FaissClient :
+    client = FaissClient(dim = vectors.shape[1], index_type = index_type, metric = metric, ann_min_size = 1, **options)
+    for id, vector in zip(ids.tolist(), vectors) :
+        client.add_embedding(id, vector)
+    t0 = time.perf_counter()
+    client.build_index()
+    if index_type != "flat" :
+        print(f"  {index_type} 학습/추가 시간: {time.perf_counter() - t0:.2f}s")
+    return client
+
+def run_queries(client : FaissClient, queries : np.ndarray, k : int, **params) -> tuple[list, np.ndarray] :
+    results, latencies = [], []
+    for q in queries :
+        t0 = time.perf_counter()
+        results.append(client.query(q, k, **params))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return results, np.array(latencies)
+
+def report(synthetic : int, n_queries : int, k : int, metric : str) :
+    ids, vectors = load_vectors(synthetic)
+    print(f"벡터 {len(ids)}개, 질의 {n_queries}개, recall@{k}, metric={metric}")
+
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, len(vectors), n_queries)
+    queries = vectors[picks] + 0.05 * rng.standard_normal((n_queries, vectors.shape[1])).astype("float32")
+
+    flat = build_client("flat", ids, vectors, metric)
+    truth, flat_lat = run_queries(flat, queries, k)
+    rows = [("flat", "-", 1.0, flat_lat.mean(), np.percentile(flat_lat, 95))]
+
+    for index_type, options, param_grid in CONFIGS :
+        if index_type == "ivfpq" and len(ids) < 39 * 256 :
+            print(f"  ivfpq 건너뜀: PQ 학습에 최소 {39 * 256}개 필요")
+            continue
+        client = build_client(index_type, ids, vectors, metric, **options)
+        for params in param_grid :
+            results, lat = run_queries(client, queries, k, **params)
+            recall = np.mean([len(set(r) & set(t)) / max(len(t), 1) for r, t in zip(results, truth)])
+            label = ", ".join(f"{key}={value}" for key, value in params.items())
+            rows.append((index_type, label, recall, lat.mean(), np.percentile(lat, 95)))
+
+    print(f"\n{'index':<8}{'params':<24}{'recall':>8}{'mean ms':>10}{'p95 ms':>10}")
+    for index_type, label, recall, mean, p95 in rows :
+        print(f"{index_type:<8}{label:<24}{recall:>8.3f}{mean:>10.3f}{p95:>10.3f}")
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "ANN 인덱스 recall / latency 비교 (flat 기준)")
+    parser.add_argument("--synthetic", type = int, default = 0, help = "합성 벡터 개수 (0이면 저장된 게시글 벡터 사용)")
+    parser.add_argument("--queries", type = int, default = 200)
+    parser.add_argument("--k", type = int, default = 10)
+    parser.add_argument("--metric", choices = ("cosine", "l2"), default = post_vectors.metric, help = "기본값은 게시글 컬렉션과 같은 metric")
+    args = parser.parse_args()
+    report(args.synthetic, args.queries, args.k, args.metric)
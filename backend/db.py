@@ -1,3 +1,4 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
@@ -6,10 +7,84 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 DATABASE_URL = f"sqlite+aiosqlite:///{current_dir}/test.db"
 
-engine = create_async_engine(DATABASE_URL, echo = True)
+# 엔진 프로필: "dev" (SQL 로그 출력) / "prod" (로그 끔, 큰 캐시 + mmap)
+DB_PROFILE = os.environ.get("DB_PROFILE", "dev")
+
+# 두 프로필 공통: WAL 이면 읽기와 쓰기가 서로를 막지 않음
+# busy_timeout 은 다른 연결이 쓰기 잠금을 잡고 있을 때 바로 실패하지 않고 기다리는 시간(ms)
+_BASE_PRAGMAS = {
+    "journal_mode" : "WAL",
+    "synchronous"  : "NORMAL",  # WAL 에서는 NORMAL 로도 커밋된 데이터가 손상되지 않음
+    "busy_timeout" : 5000,
+}
+
+DB_PROFILES = {
+    "dev" : {
+        "echo"            : True,
+        "pool_size"       : 2,   # 쓰기 연결 (SQLite 쓰기는 어차피 한 번에 하나)
+        "read_pool_size"  : 4,   # 읽기 전용 연결
+        "statement_cache" : 128,
+        "pragmas"         : dict(_BASE_PRAGMAS),
+    },
+    "prod" : {
+        "echo"            : False,
+        "pool_size"       : 4,
+        "read_pool_size"  : 16,
+        "statement_cache" : 512,
+        "pragmas"         : dict(
+            _BASE_PRAGMAS,
+            cache_size = -64000,     # 연결당 페이지 캐시 64MB (음수는 KiB 단위)
+            mmap_size  = 268435456,  # 256MB 메모리 맵 읽기
+            temp_store = "MEMORY",
+        ),
+    },
+}
+
+def _create_engine (profile : dict, pool_size : int, read_only : bool = False) :
+    """
+    프로필대로 엔진 생성. 연결될 때마다 PRAGMA 를 적용하고,
+    sqlite3 의 prepared statement 캐시(cached_statements)와 SQLAlchemy 컴파일 캐시 크기를 맞춘다.
+    """
+    new_engine = create_async_engine(
+        DATABASE_URL,
+        echo = profile["echo"],
+        pool_size = pool_size,
+        max_overflow = pool_size,
+        query_cache_size = profile["statement_cache"] * 4,
+        connect_args = {"cached_statements" : profile["statement_cache"]},
+    )
+    pragmas = dict(profile["pragmas"])
+    if read_only :
+        pragmas["query_only"] = "ON"
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _apply_pragmas (dbapi_connection, connection_record) :
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items() :
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return new_engine
+
+_profile = DB_PROFILES[DB_PROFILE]
+
+# 쓰기용 (트랜잭션, 마이그레이션) / 읽기 전용 엔진 - 읽기 요청이 쓰기 연결 풀을 기다리지 않도록 분리
+engine = _create_engine(_profile, _profile["pool_size"])
+read_engine = _create_engine(_profile, _profile["read_pool_size"], read_only = True)
+
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit = False)
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit = False, autoflush = False)
 Base = declarative_base()
 
 async def get_session() :
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_session() :
+    """조회 전용 세션 (query_only 연결이라 쓰기 시도는 오류)"""
+    async with ReadSessionLocal() as session:
+        yield session
+
+async def dispose_engines () :
+    await engine.dispose()
+    await read_engine.dispose()
@@ -0,0 +1,51 @@
+import asyncio
+from backend.recommendations import update_user_embeddings
+
+class UserEmbeddingWorker :
+    """
+    interaction 이 기록될 때 사용자 id 만 큐에 넣고, 백그라운드 태스크가 모아서 갱신.
+    같은 사용자의 연속된 이벤트는 하나로 합쳐지고(coalesce), debounce 동안 들어온
+    사용자들을 batch_size 단위로 update_user_embeddings 에 넘긴다.
+    """
+
+    def __init__(self, debounce : float = 0.5, batch_size : int = 64) :
+
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self._pending : dict[int, None] = {}  # 삽입 순서를 유지하는 집합
+        self._wakeup = asyncio.Event()
+
+    def submit(self, user_id : int) :
+        """요청 경로에서 호출 - DB / 벡터 연산 없이 즉시 반환"""
+        self._pending[int(user_id)] = None
+        self._wakeup.set()
+
+    def _take_batch(self) -> list[int] :
+        batch = list(self._pending)[:self.batch_size]
+        for user_id in batch :
+            del self._pending[user_id]
+        return batch
+
+    async def _flush(self) :
+        while self._pending :
+            batch = self._take_batch()
+            try:
+                await update_user_embeddings(batch)
+            except Exception as e:
+                print(f"사용자 벡터 배치 업데이트 오류 ({batch}): {e}")
+
+    async def run(self) :
+        """lifespan 에서 백그라운드 태스크로 실행"""
+        while True :
+            await self._wakeup.wait()
+            # 짧은 시간 동안 들어오는 이벤트를 모아서 한 번에 처리
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            await self._flush()
+
+    async def drain(self) :
+        """종료 시 남은 업데이트 처리"""
+        await self._flush()
+
+# 프로세스 전역 워커
+user_embedding_worker = UserEmbeddingWorker()
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import importlib.util
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from backend.vector_utils import normalize
+from backend.inference import run_inference
+from backend.translation import translator
+
+# 임베딩 백엔드: "labse" (sentence-transformers, CPU) / "hash" (결정적 해싱, 테스트용)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "labse")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/LaBSE")
+# 1 이면 임베딩 전에 한→영 번역 (MarianMT)
+EMBEDDING_TRANSLATE = os.environ.get("EMBEDDING_TRANSLATE", "0") == "1"
+# 1 이면 lifespan 시작 시 백그라운드에서 모델을 미리 로드
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+# 내용 해시 -> 벡터 캐시 파일 (빈 문자열이면 캐시 사용 안 함)
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.db")
+)
+
+class HashingEmbedder :
+    """
+    단어와 문자 3-gram 을 blake2b 로 해싱해 부호 있는 버킷에 더하는 결정적 임베딩.
+    프로세스 / 재시작과 무관하게 같은 텍스트는 같은 벡터가 되고, 겹치는 단어가 많을수록 가까워진다.
+    """
+
+    def __init__(self, dim : int = 768) :
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def _features(self, text : str) -> list[str] :
+        text = text.lower()
+        return re.findall(r"\w+", text) + [text[i:i + 3] for i in range(len(text) - 2)]
+
+    def encode(self, texts : list[str]) -> np.ndarray :
+        out = np.zeros((len(texts), self.dim), dtype = "float32")
+        for row, text in enumerate(texts) :
+            features = self._features(text)
+            if not features :
+                continue
+            hashes = np.array(
+                [int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size = 8).digest(), "little") for f in features],
+                dtype = "uint64"
+            )
+            buckets = (hashes % np.uint64(self.dim)).astype("int64")
+            signs = np.where((hashes >> np.uint64(63)) & np.uint64(1), -1.0, 1.0).astype("float32")
+            np.add.at(out[row], buckets, signs)
+        return normalize(out)
+
+    def warm_up(self) :
+        pass
+
+class SentenceTransformerEmbedder :
+    """sentence-transformers 모델 (기본 LaBSE, 768차원). 첫 encode 에서 CPU 로 로드"""
+
+    def __init__(self, model_name : str = "sentence-transformers/LaBSE", dim : int = 768, batch_size : int = 32) :
+        self.model_name = model_name
+        self.name = model_name
+        self.dim = dim
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self) :
+        if self._model is None :
+            with self._lock :
+                if self._model is None :
+                    from sentence_transformers import SentenceTransformer
+                    print(f"임베딩 모델 로드: {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name, device = "cpu")
+        return self._model
+
+    def encode(self, texts : list[str]) -> np.ndarray :
+        model = self._load()
+        with self._lock :
+            vectors = model.encode(
+                texts, batch_size = self.batch_size, convert_to_numpy = True, normalize_embeddings = True
+            )
+        return np.asarray(vectors, dtype = "float32")
+
+    def warm_up(self) :
+        self.encode(["모델 워밍업"])
+
+class EmbeddingCache :
+    """(백엔드 이름, 텍스트) 의 sha256 을 키로 float32 벡터를 저장하는 sqlite 캐시"""
+
+    def __init__(self, path : str) :
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) :
+        if self._conn is None :
+            self._conn = sqlite3.connect(self.path, check_same_thread = False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        return self._conn
+
+    @staticmethod
+    def key(name : str, text : str) -> bytes :
+        return hashlib.sha256(f"{name}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys : list[bytes]) -> dict[bytes, np.ndarray] :
+        found = {}
+        with self._lock :
+            conn = self._connect()
+            for start in range(0, len(keys), 500) :
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows :
+                    found[key] = np.frombuffer(blob, dtype = "float32")
+        return found
+
+    def put_many(self, items : dict[bytes, np.ndarray]) :
+        with self._lock :
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype = "float32").tobytes()) for key, vector in items.items()]
+            )
+            conn.commit()
+
+class EmbeddingService :
+    """
+    텍스트 임베딩 진입점.
+    - embed_many(): 캐시에 없는 텍스트만 백엔드로 한 번에 encode (스크립트 / 스레드용)
+    - embed(): 요청 경로용. 동시에 들어온 요청을 max_wait 초 / max_batch 개 단위로 모아서
+      embed_many 를 추론 스레드 풀에서 한 번 실행 (micro-batching)
+    translator 가 있으면 캐시에 없는 텍스트를 먼저 번역한 뒤 encode 한다.
+    """
+
+    def __init__(self, backend, cache : EmbeddingCache | None = None, translator = None, max_batch : int = 32, max_wait : float = 0.005) :
+
+        self.backend = backend
+        self.cache = cache
+        self.translator = translator
+        # 캐시 키에 쓰는 이름 (번역 여부에 따라 벡터가 달라지므로 구분)
+        self.name = backend.name + (f"+{translator.model_name}" if translator else "")
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    def embed_many(self, texts : list[str]) -> np.ndarray :
+        texts = [text or "" for text in texts]
+        out = np.zeros((len(texts), self.backend.dim), dtype = "float32")
+        keys = [EmbeddingCache.key(self.name, text) for text in texts]
+        cached = self.cache.get_many(list(set(keys))) if self.cache else {}
+
+        missing = {}  # 텍스트 -> 행 목록 (같은 텍스트는 한 번만 encode)
+        for row, (text, key) in enumerate(zip(texts, keys)) :
+            if key in cached :
+                out[row] = cached[key]
+            else :
+                missing.setdefault(text, []).append(row)
+        if missing :
+            sources = list(missing)
+            if self.translator :
+                sources = self.translator.translate(sources)
+            vectors = self.backend.encode(sources)
+            new_items = {}
+            for (text, rows), vector in zip(missing.items(), vectors) :
+                out[rows] = vector
+                new_items[EmbeddingCache.key(self.name, text)] = vector
+            if self.cache :
+                self.cache.put_many(new_items)
+        return out
+
+    def embed_sync(self, text : str) -> np.ndarray :
+        return self.embed_many([text])[0]
+
+    def _ensure_batcher(self) :
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop :
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._batch_loop())
+
+    async def _batch_loop(self) :
+        loop = asyncio.get_running_loop()
+        while True :
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch :
+                timeout = deadline - loop.time()
+                if timeout <= 0 :
+                    break
+                try :
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError :
+                    break
+            try :
+                vectors = await run_inference(self.embed_many, [text for text, _ in batch])
+                for (_, future), vector in zip(batch, vectors) :
+                    if not future.done() :
+                        future.set_result(vector)
+            except Exception as e :
+                for _, future in batch :
+                    if not future.done() :
+                        future.set_exception(e)
+
+    def warm_up(self) :
+        """모델 로드 + 더미 추론 한 번 (첫 요청이 로딩 시간을 기다리지 않도록)"""
+        if self.translator :
+            self.translator.warm_up()
+        self.backend.warm_up()
+
+    async def warm_up_async(self) :
+        try :
+            await run_inference(self.warm_up)
+            print(f"임베딩 모델 워밍업 완료: {self.name}")
+        except Exception as e :
+            print(f"임베딩 모델 워밍업 실패: {e}")
+
+    async def embed(self, text : str) -> np.ndarray :
+        self._ensure_batcher()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+def _make_backend(name : str, dim : int = 768) :
+    if name == "hash" :
+        return HashingEmbedder(dim)
+    if importlib.util.find_spec("sentence_transformers") is None :
+        print("sentence-transformers 가 없어 해싱 임베딩으로 대체")
+        return HashingEmbedder(dim)
+    return SentenceTransformerEmbedder(EMBEDDING_MODEL, dim)
+
+# 프로세스 전역 임베딩 서비스
+embedder = EmbeddingService(
+    _make_backend(EMBEDDING_BACKEND),
+    cache = EmbeddingCache(EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_PATH else None,
+    translator = translator if EMBEDDING_TRANSLATE else None
+)
@@ -52,11 +52,13 @@ async def export_all():
         
         # TagVector 테이블 export (id, vector)
         from backend.models import TagVector
+        from backend.vector_utils import blob_to_vector
         result = await session.execute(select(TagVector))
         tag_vectors = result.scalars().all()
         tag_vec_data = []
         for tag_vec in tag_vectors:
-            tag_vec_data.append({"id": tag_vec.tag_id, "vector": json.loads(tag_vec.vector)})
+            vector = blob_to_vector(tag_vec.vector, tag_vec.dtype)
+            tag_vec_data.append({"id": tag_vec.tag_id, "vector": vector.tolist()})
         with open(os.path.join(EXPORT_DIR, 'tag_vectors.json'), 'w', encoding='utf-8') as f:
             json.dump(tag_vec_data, f, ensure_ascii=False, indent=2)
         print(f"Exported tag_vectors.json ({len(tag_vec_data)} records)")
@@ -0,0 +1,12 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# 모델 추론 전용 스레드 수 (기본 executor 를 쓰는 스냅샷 저장 등과 섞이지 않도록 분리)
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "2"))
+
+inference_executor = ThreadPoolExecutor(max_workers = INFERENCE_THREADS, thread_name_prefix = "inference")
+
+async def run_inference(fn, *args) :
+    """모델 추론(동기 함수)을 추론 전용 스레드 풀에서 실행"""
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, fn, *args)
@@ -4,28 +4,97 @@ from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncEngine
-from backend.db import engine, Base, get_session
+from backend.db import engine, Base, get_session, get_read_session, dispose_engines
 from backend.models import Post, Member, Tag, PostTag, Interaction
 from backend.recommendations import (
-    get_user_based_recs, get_latest_posts, get_top_viewed_posts,
-    get_post_view_recs, suggest_tags_for_content, generate_weekly_email,
-    search_content_based, search_hybrid, update_user_embedding
+    get_user_based_recs, get_similar_posts,
+    get_post_view_recs, generate_weekly_email,
+    search_content_based, search_hybrid, backfill_post_vectors, reset_user_embeddings
 )
-from backend.vector_db import FaissClient
-from sqlalchemy import select, func, text
-from sqlalchemy.orm import selectinload
+from backend.tag_cache import tag_cache
+from backend.post_cache import post_cache, post_counts
+from backend.view_counter import view_counter
+from backend.neighbors import neighbor_worker
+from backend.seen_posts import seen_posts
+from backend.embeddings import embedder, MODEL_WARMUP
+from backend.weekly_email import send_weekly_emails
+from backend.suggest_cache import tag_suggestions
+from backend.tag_store import prepare_tags, resolve_tags, reembed_tag_vectors, add_post_tags, delete_orphan_tags, sweep_orphan_tags_periodically, TAG_GC_INTERVAL
+from backend.embedding_worker import user_embedding_worker
+from backend.vector_db import vector_store, post_vectors, user_vectors
+from sqlalchemy import select, func, text, or_, and_, delete
+from sqlalchemy.orm import selectinload, load_only
 from datetime import datetime, timezone, timedelta
-from backend.vector_utils import json_to_vector, cosine_similarity
-
-vec_client = FaissClient(dim=768)
+from backend.vector_utils import top_k_similar
+from backend.migrations import run_migrations
+import asyncio
+import base64
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) :
     
     async with engine.begin() as conn :
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+
+    # 임베딩(번역) 모델은 요청을 막지 않도록 백그라운드에서 미리 로드
+    warmup_task = asyncio.create_task(embedder.warm_up_async()) if MODEL_WARMUP else None
+
+    # 벡터 스토어 스냅샷 + WAL 복원 후 주기적으로 저장
+    await asyncio.to_thread(vector_store.load)
+    persist_task = asyncio.create_task(vector_store.persist_periodically())
+    # 다른 임베딩 모델로 만든 벡터는 다시 임베딩하고, 빠진 게시글 벡터는 본문으로 보충 (시작을 막지 않도록 백그라운드)
+    backfill_task = asyncio.create_task(_sync_vectors())
+    # interaction 으로 인한 사용자 벡터 갱신은 요청 경로 밖에서 배치 처리
+    embedding_task = asyncio.create_task(user_embedding_worker.run())
+    # 조회수 버퍼 모드면 누적된 증가분을 주기적으로 반영
+    view_task = asyncio.create_task(view_counter.run()) if view_counter.buffered else None
+    # 게시글 이웃 테이블 (비어 있으면 전체 계산, 이후 증분 갱신 + 주기적 재계산)
+    neighbor_task = asyncio.create_task(neighbor_worker.run())
+    # 요청 경로에서 놓친 고아 태그 / 벡터를 주기적으로 정리
+    tag_gc_task = asyncio.create_task(sweep_orphan_tags_periodically()) if TAG_GC_INTERVAL > 0 else None
     yield
-
+    backfill_task.cancel()
+    if tag_gc_task :
+        tag_gc_task.cancel()
+    embedding_task.cancel()
+    await user_embedding_worker.drain()
+    neighbor_task.cancel()
+    await neighbor_worker.drain()
+    if warmup_task :
+        warmup_task.cancel()
+    if view_task :
+        view_task.cancel()
+        await view_counter.flush()
+    persist_task.cancel()
+    await asyncio.to_thread(vector_store.snapshot)
+    await dispose_engines()
+
+async def _sync_vectors () :
+    """
+    저장된 벡터를 현재 임베딩 모델에 맞춤.
+    태그 벡터 / posts 컬렉션이 다른 모델로 만들어졌으면 다시 임베딩하고, 그 게시글 벡터에서
+    나온 사용자 벡터와 이웃 목록도 다시 계산한다. 같은 모델이면 빠진 게시글 벡터만 채운다.
+    """
+    try :
+        await reembed_tag_vectors()
+        posts_changed = post_vectors.model != embedder.name
+        if posts_changed :
+            print(f"게시글 벡터 모델 변경 ({post_vectors.model} -> {embedder.name}): 전체 다시 임베딩")
+        post_ids = await backfill_post_vectors(all_posts = posts_changed)
+        post_vectors.set_model(embedder.name)
+
+        if posts_changed or user_vectors.model != embedder.name :
+            for user_id in await reset_user_embeddings() :
+                user_embedding_worker.submit(user_id)
+            user_vectors.set_model(embedder.name)
+        if posts_changed :
+            await neighbor_worker.rebuild()
+        else :
+            for post_id in post_ids :
+                neighbor_worker.submit(post_id)
+    except Exception as e :
+        print(f"벡터 모델 동기화 오류: {e}")
 
 app = FastAPI(lifespan = lifespan)
 
@@ -67,7 +136,7 @@ async def serve_search() :
 # 0) 게시글 단일 조회 (조회수 증가 없음)
 @app.get("/api/posts/{post_id}")
 async def read_post (post_id: int) :
-    async for session in get_session() :
+    async for session in get_read_session() :
         result = await session.execute(
             select(Post).options(selectinload(Post.tags)).where(Post.post_id == post_id)
         )
@@ -75,30 +144,26 @@ async def read_post (post_id: int) :
         if not post:
             raise HTTPException(status_code=404, detail={"error": "게시글을 찾을 수 없습니다."})
         
-        return post.to_dict()
+        data = post.to_dict()
+        data["views"] = view_counter.current(post_id, data["views"])
+        return data
 
 # 0-1) 게시글 조회수 증가
 @app.post("/api/posts/{post_id}/view")
 async def increment_view (post_id: int) :
-    async for session in get_session() :
-        result = await session.execute(
-            select(Post).where(Post.post_id == post_id)
-        )
-        post = result.scalars().first()
-        if not post:
-            raise HTTPException(status_code=404, detail={"error": "게시글을 찾을 수 없습니다."})
-        
-        # 조회수 증가
-        post.views += 1
-        await session.commit()
-        
-        return {"message": "조회수가 증가되었습니다.", "views": post.views}
+    # 조회수 증가 (UPDATE ... views = views + 1, 버퍼 모드면 메모리에 누적)
+    views = await view_counter.increment(post_id)
+    if views is None:
+        raise HTTPException(status_code=404, detail={"error": "게시글을 찾을 수 없습니다."})
+    post_cache.set_views(post_id, views)
+    
+    return {"message": "조회수가 증가되었습니다.", "views": views}
 
 # 태그 목록 반환
 @app.get("/api/tags")
 async def get_tags():
     try:
-        async for session in get_session():
+        async for session in get_read_session():
             result = await session.execute(
                 select(Tag.tag_id, Tag.tag_name, func.count(PostTag.post_id))
                 .select_from(Tag)
@@ -115,31 +180,34 @@ async def get_tags():
 # 1~3) 대시보드 3×3
 @app.get("/api/dashboard/{user_id}")
 async def dashboard(user_id : int) :
-    user_recs = await get_user_based_recs(user_id, 3)
-    latest    = await get_latest_posts(3)
-    popular   = await get_top_viewed_posts(3)
+    # 서로 독립적인 조회이므로 각자 세션을 잡고 동시에 실행
+    user_recs, (latest, popular) = await asyncio.gather(
+        get_user_based_recs(user_id, 3),
+        post_cache.get(3)
+    )
     
     return {
-        "user_recs": [p.to_dict() for p in user_recs] if user_recs else [],
-        "latest":    [p.to_dict() for p in latest] if latest else [],
-        "popular":   [p.to_dict() for p in popular] if popular else [],
+        "user_recs": [p.to_dict() for p in user_recs["posts"]] if user_recs["posts"] else [],
+        "latest":    latest,
+        "popular":   popular,
     }
 
 # 메인페이지 추천 게시글 (사용자 기반 + 최신 + 인기)
 @app.get("/api/recommendations/{user_id}")
 async def get_recommendations(user_id: int):
     try:
-        user_recs_result = await get_user_based_recs(user_id, 3)
+        user_recs_result, (latest, popular) = await asyncio.gather(
+            get_user_based_recs(user_id, 3),
+            post_cache.get(3)
+        )
         user_recs = user_recs_result["posts"]
         similarity = user_recs_result["similarity"]
         tag_name = user_recs_result["tag_name"]
         post_similarities = user_recs_result.get("post_similarities", [])
-        latest = await get_latest_posts(3)
-        popular = await get_top_viewed_posts(3)
         return {
             "user_based": [p.to_dict() for p in user_recs] if user_recs else [],
-            "latest": [p.to_dict() for p in latest] if latest else [],
-            "popular": [p.to_dict() for p in popular] if popular else [],
+            "latest": latest,
+            "popular": popular,
             "similarity": similarity,
             "tag_name": tag_name,
             "post_similarities": post_similarities
@@ -149,44 +217,48 @@ async def get_recommendations(user_id: int):
 
 # 포스트 상세페이지 하단 추천 게시글 (페이지네이션 지원)
 @app.get("/api/posts/{post_id}/related")
-async def get_related_posts(post_id: int, user_id: int = 1, page: int = 1, page_size: int = 3):
+async def get_related_posts(post_id: int, user_id: int = 1, page: int = 1, page_size: int = 3, by: str = "tags"):
     try:
-        async for session in get_session():
-            # 현재 게시글 조회 (조회수 증가 없이)
-            result = await session.execute(
-                select(Post).options(selectinload(Post.tags)).where(Post.post_id == post_id)
-            )
-            current_post = result.scalars().first()
-            if not current_post:
-                raise HTTPException(status_code=404, detail={"error": "게시글을 찾을 수 없습니다."})
-            current_tags = [tag.tag_id for tag in current_post.tags]
-            related_posts = []
-            if current_tags:
-                result = await session.execute(
-                    select(Post).options(selectinload(Post.tags))
-                    .join(PostTag, Post.post_id == PostTag.post_id)
+        page = max(page, 1)
+        if by == "vector":
+            # 미리 계산된 이웃 목록 (post_neighbors 한 행) 을 페이지로 자름
+            return await _related_by_vector(post_id, user_id, page, page_size)
+        current_tags = select(PostTag.tag_id).where(PostTag.post_id == post_id)
+        # 공유 태그 수 → 조회수 순으로 SQL 에서 한 페이지만 계산 (total 은 window count)
+        shared = func.count(PostTag.tag_id).label("shared")
+        ranking = (
+            select(PostTag.post_id, shared, func.count().over().label("total"))
+            .join(Post, Post.post_id == PostTag.post_id)
+            .where(PostTag.tag_id.in_(current_tags))
+            .where(PostTag.post_id != post_id)
+            .group_by(PostTag.post_id, Post.views)
+            .order_by(shared.desc(), Post.views.desc(), PostTag.post_id.desc())
+            .limit(page_size)
+            .offset((page - 1) * page_size)
+        )
+        async for session in get_read_session():
+            rows = (await session.execute(ranking)).all()
+            if rows:
+                total = rows[0].total
+            else:
+                # 범위를 벗어난 페이지인지, 관련 게시글이 아예 없는지 구분
+                total = (await session.execute(
+                    select(func.count(func.distinct(PostTag.post_id)))
                     .where(PostTag.tag_id.in_(current_tags))
-                    .where(Post.post_id != post_id)
-                    .order_by(Post.views.desc())
+                    .where(PostTag.post_id != post_id)
+                )).scalar()
+                if not total and not await session.get(Post, post_id):
+                    raise HTTPException(status_code=404, detail={"error": "게시글을 찾을 수 없습니다."})
+
+            if total:
+                order = {row.post_id: i for i, row in enumerate(rows)}
+                result = await session.execute(
+                    select(Post).options(selectinload(Post.tags)).where(Post.post_id.in_(order.keys()))
                 )
-                all_related = result.scalars().all() or []
-                seen = set()
-                for p in all_related:
-                    if getattr(p, 'post_id', None) is not None and p.post_id not in seen:
-                        seen.add(p.post_id)
-                        related_posts.append(p)
-            if not related_posts:
-                user_recs = await get_user_based_recs(user_id, 20) or []
-                seen = set([int(post_id)])
-                related_posts = []
-                for p in user_recs:
-                    if getattr(p, 'post_id', None) is not None and p.post_id not in seen:
-                        seen.add(p.post_id)
-                        related_posts.append(p)
-            total = len(related_posts)
-            start = (page - 1) * page_size
-            end = start + page_size
-            page_items = related_posts[start:end]
+                page_items = sorted(result.scalars().all(), key=lambda p: order[p.post_id])
+            else:
+                # 태그가 겹치는 게시글이 없으면 벡터 이웃으로 대체
+                return await _related_by_vector(post_id, user_id, page, page_size)
             return {
                 "total": total,
                 "page": page,
@@ -198,75 +270,70 @@ async def get_related_posts(post_id: int, user_id: int = 1, page: int = 1, page_
     except Exception as e:
         raise HTTPException(status_code=500, detail={"error": f"관련 포스트 추천 오류: {e}"})
 
+async def _related_by_vector (post_id : int, user_id : int, page : int, page_size : int) :
+    recs = await get_similar_posts(post_id, neighbor_worker.k)
+    if recs is None:
+        async for session in get_read_session():
+            if not await session.get(Post, post_id):
+                raise HTTPException(status_code=404, detail={"error": "게시글을 찾을 수 없습니다."})
+        # 이웃이 아직 계산되지 않았으면 사용자 기반 추천
+        recs = await get_user_based_recs(user_id, 20)
+    related_posts = [p for p in recs["posts"] if p.post_id != post_id]
+    start = (page - 1) * page_size
+    return {
+        "total": len(related_posts),
+        "page": page,
+        "page_size": page_size,
+        "posts": [p.to_dict() for p in related_posts[start:start + page_size]]
+    }
+
 # 4) 본 후 추천
 @app.get("/api/posts/{user_id}/{post_id}/recs")
 async def post_recs (user_id : int, post_id : int) :
     recs = await get_post_view_recs(user_id, post_id, 3)
-    return [p.to_dict() for p in recs] if recs else []
+    return [p.to_dict() for p in recs["posts"]] if recs["posts"] else []
+
+# 최신/인기 캐시에 넣을 dict 는 태그까지 다시 읽어서 만듦
+async def _refresh_post_cache (session, post_id : int) :
+    result = await session.execute(
+        select(Post).options(selectinload(Post.tags)).where(Post.post_id == post_id)
+        .execution_options(populate_existing = True)
+    )
+    post = result.scalars().first()
+    if post :
+        post_cache.upsert(post.to_dict())
 
 # 5) 게시글 생성 + 태그 추천
 @app.post("/api/posts/")
 async def create_post (payload : dict) :
+    # 태그 추천은 DB 쓰기 전에 (추천 결과는 캐시됨)
+    recommended_tags = await tag_suggestions.get(payload["content"])
+    # 새 태그 벡터도 트랜잭션(쓰기 잠금) 시작 전에 임베딩
+    prepared_tags = await prepare_tags(recommended_tags)
+
     async for session in get_session() :
         # tags 필드는 Post 생성 시 제외
         post_data = payload.copy()
         post_data.pop('tags', None)
         post = Post(**post_data)
         session.add(post)
-        await session.commit()
-        await session.refresh(post)
+        await session.flush()  # post_id 만 받고 commit 은 마지막에 한 번
 
-        # 태그 추천 & 매핑
-        recommended_tags = await suggest_tags_for_content(payload["content"])
-        
-        # 추천된 태그들을 처리
-        for tag_name in recommended_tags:
-            # 1. 태그가 이미 존재하는지 확인
-            existing_tag = await session.execute(
-                select(Tag).where(Tag.tag_name == tag_name)
-            )
-            tag = existing_tag.scalars().first()
-            
-            if not tag:
-                # 2. 태그가 없으면 새로 생성
-                tag = Tag(tag_name=tag_name)
-                session.add(tag)
-                await session.commit()
-                await session.refresh(tag)
-                
-                # 3. 새 태그의 벡터 생성 및 저장
-                from backend.vector_utils import get_embedding, vector_to_json
-                from backend.models import TagVector
-                
-                try:
-                    tag_vector = get_embedding(tag_name)
-                    vector_json = vector_to_json(tag_vector)
-                    
-                    tag_vector_record = TagVector(
-                        tag_id=tag.tag_id,
-                        vector=vector_json
-                    )
-                    session.add(tag_vector_record)
-                    await session.commit()
-                    print(f"새 태그 '{tag_name}' 벡터 생성 완료")
-                except Exception as e:
-                    print(f"태그 '{tag_name}' 벡터 생성 실패: {e}")
-            
-            # 4. PostTag 매핑 (중복 방지)
-            existing_mapping = await session.execute(
-                select(PostTag).where(
-                    PostTag.post_id == post.post_id,
-                    PostTag.tag_id == tag.tag_id
-                )
-            )
-            if not existing_mapping.scalars().first():
-                session.add(PostTag(post_id=post.post_id, tag_id=tag.tag_id))
-        
+        # 태그 조회 / 생성(벡터 포함) / 매핑을 집합 단위로 처리
+        tag_ids, created_tags = await resolve_tags(session, prepared_tags)
+        await add_post_tags(session, post.post_id, tag_ids.values())
         await session.commit()
 
+        for tag_id, tag_name, tag_vector in created_tags:
+            tag_cache.upsert(tag_id, tag_name, tag_vector)
+            print(f"새 태그 '{tag_name}' 벡터 생성 완료")
+        await _refresh_post_cache(session, post.post_id)
+        post_counts.invalidate()
+
         # FAISS 벡터 추가
-        vec = vec_client.embed_text(payload["content"])
-        vec_client.add_embedding(int(post.post_id), vec)
+        vec = await embedder.embed(payload["content"])
+        post_vectors.add_embedding(int(post.post_id), vec)
+        neighbor_worker.submit(post.post_id)
 
         return {"post_id" : post.post_id, "tags" : recommended_tags}
 
@@ -274,6 +341,10 @@ async def create_post (payload : dict) :
 @app.put("/api/posts/{post_id}")
 async def update_post(post_id: int, payload: dict):
     print(f"게시글 수정 요청 - post_id: {post_id}, payload: {payload}")
+    # 새 태그 이름의 벡터는 게시글 UPDATE 가 flush 되기 전에 (쓰기 잠금 없이) 임베딩
+    tag_items = payload.get("tags") or []
+    prepared_tags = await prepare_tags([item for item in tag_items if isinstance(item, str)])
+
     async for session in get_session():
         # 기존 게시글 조회
         result = await session.execute(
@@ -292,57 +363,44 @@ async def update_post(post_id: int, payload: dict):
         post.image = payload.get("image", post.image)
         post.updated_at = datetime.now(timezone.utc)
         
-        # 기존 태그 매핑 삭제 및 사용되지 않는 태그 정리
-        existing_tags = await session.execute(
-            select(PostTag).where(PostTag.post_id == post_id)
-        )
-        old_tag_ids = set()
-        for tag_mapping in existing_tags.scalars().all():
-            old_tag_ids.add(tag_mapping.tag_id)
-            await session.delete(tag_mapping)
-        
-        print(f"기존 태그 삭제: {old_tag_ids}")
-        
-        # 이제 사용되지 않는 태그들 삭제
-        for tag_id in old_tag_ids:
-            # 해당 태그를 사용하는 다른 게시글이 있는지 확인
-            other_posts = await session.execute(
-                select(PostTag).where(PostTag.tag_id == tag_id)
+        # 새 태그 목록 (id 는 존재하는 것만, 이름은 없으면 벡터와 함께 생성)
+        new_tag_ids = set()
+        created_tags = []
+        given_ids = [item for item in tag_items if isinstance(item, int)]
+        if given_ids:
+            result = await session.execute(select(Tag.tag_id).where(Tag.tag_id.in_(given_ids)))
+            new_tag_ids.update(row[0] for row in result.all())
+        name_ids, created_tags = await resolve_tags(session, prepared_tags)
+        new_tag_ids.update(name_ids.values())
+
+        # 빠진 태그 매핑만 한 번에 삭제하고, 새 매핑은 한 번에 추가
+        result = await session.execute(select(PostTag.tag_id).where(PostTag.post_id == post_id))
+        old_tag_ids = {row[0] for row in result.all()}
+        removed_tag_ids = old_tag_ids - new_tag_ids
+        if removed_tag_ids:
+            await session.execute(
+                delete(PostTag).where(PostTag.post_id == post_id, PostTag.tag_id.in_(removed_tag_ids))
             )
-            if not other_posts.scalars().first():
-                # 사용되지 않는 태그 삭제
-                tag_to_delete = await session.execute(
-                    select(Tag).where(Tag.tag_id == tag_id)
-                )
-                tag = tag_to_delete.scalars().first()
-                if tag:
-                    await session.delete(tag)
-                    print(f"사용되지 않는 태그 삭제: {tag.tag_name} (ID: {tag_id})")
+        await add_post_tags(session, post_id, new_tag_ids - old_tag_ids)
+        print(f"기존 태그 삭제: {removed_tag_ids}")
         
-        # 새 태그 매핑 추가
-        if "tags" in payload and payload["tags"]:
-            for tag_item in payload["tags"]:
-                tag = None
-                if isinstance(tag_item, int):
-                    tag = await session.get(Tag, tag_item)
-                elif isinstance(tag_item, str):
-                    tag = (await session.execute(select(Tag).where(Tag.tag_name == tag_item))).scalars().first()
-                    if not tag:
-                        tag = Tag(tag_name=tag_item)
-                        session.add(tag)
-                        await session.commit()
-                        await session.refresh(tag)
-                if tag:
-                    session.add(PostTag(post_id=post_id, tag_id=tag.tag_id))
+        # 빠진 태그 중 이제 사용되지 않는 태그들 (벡터 포함) 삭제
+        deleted_tags = await delete_orphan_tags(session, removed_tag_ids)
         
         await session.commit()
+        tag_cache.remove([tag_id for tag_id, _ in deleted_tags])
+        for tag_id, tag_name, tag_vector in created_tags:
+            tag_cache.upsert(tag_id, tag_name, tag_vector)
+        if post_id in post_cache :
+            await _refresh_post_cache(session, post_id)
+        post_counts.invalidate()
         print(f"게시글 수정 완료 - 새 태그: {payload['tags']}")
         
         # FAISS 벡터 업데이트
         try:
-            vec = vec_client.embed_text(payload["content"])
-            vec_client.delete_embedding(post_id)
-            vec_client.add_embedding(post_id, vec)
+            vec = await embedder.embed(payload["content"])
+            post_vectors.update_embedding(post_id, vec)
+            neighbor_worker.submit(post_id)
             print(f"FAISS 벡터 업데이트 완료: {post_id}")
         except Exception as e:
             print(f"벡터 업데이트 실패: {e}")
@@ -379,31 +437,28 @@ async def delete_post(post_id: int):
             {"post_id": post_id}
         )
         
+        # 이웃 목록 삭제 (다른 게시글 목록에 남은 이 게시글은 조회 시 걸러지고 재계산 때 정리됨)
+        await session.execute(
+            text("DELETE FROM post_neighbors WHERE post_id = :post_id"),
+            {"post_id": post_id}
+        )
+        
         # 게시글 삭제
         await session.delete(post)
         
-        # 이제 사용되지 않는 태그들 삭제 (commit 전에 처리)
-        for tag_id in post_tag_ids:
-            # 해당 태그를 사용하는 다른 게시글이 있는지 확인
-            other_posts = await session.execute(
-                select(PostTag).where(PostTag.tag_id == tag_id)
-            )
-            if not other_posts.scalars().first():
-                # 사용되지 않는 태그 삭제
-                tag_to_delete = await session.execute(
-                    select(Tag).where(Tag.tag_id == tag_id)
-                )
-                tag = tag_to_delete.scalars().first()
-                if tag:
-                    await session.delete(tag)
-                    print(f"사용되지 않는 태그 삭제: {tag.tag_name} (ID: {tag_id})")
+        # 이제 사용되지 않는 태그들 (벡터 포함) 삭제 (commit 전에 처리)
+        deleted_tags = await delete_orphan_tags(session, post_tag_ids)
         
         # 모든 변경사항을 한 번에 커밋
         await session.commit()
+        tag_cache.remove([tag_id for tag_id, _ in deleted_tags])
+        post_cache.remove(post_id)
+        post_counts.invalidate()
+        view_counter.forget(post_id)
         
         # 벡터 DB에서도 삭제
         try:
-            vec_client.delete_embedding(post_id)
+            post_vectors.delete_embedding(post_id)
         except Exception as e:
             print(f"벡터 DB 삭제 오류: {e}")
         
@@ -416,10 +471,16 @@ async def suggest_tags(payload: dict):
     if not content:
         return {"tags": []}
     
-    recommended_tags = await suggest_tags_for_content(content, max_tags=5)
+    recommended_tags = await tag_suggestions.get(content, max_tags=5)
     return {"tags": recommended_tags}
 
 # 6) 주간 이메일
+@app.post("/api/weekly-email")
+async def weekly_email_all(bg : BackgroundTasks) :
+    # 전체 회원 배치 생성 (진행 상황은 로그로 출력)
+    bg.add_task(send_weekly_emails)
+    return {"status" : "queued"}
+
 @app.post("/api/weekly-email/{user_id}")
 async def weekly_email(user_id : int, bg : BackgroundTasks) :
     bg.add_task(generate_weekly_email, user_id)
@@ -433,8 +494,8 @@ async def search(q : str) :
 
 # 8) 하이브리드 검색
 @app.get("/api/search/hybrid/")
-async def hybrid (q : str, user_id : int) :
-    results = await search_hybrid(q, user_id)
+async def hybrid (q : str, user_id : int, page : int = 1, page_size : int = 6) :
+    results = await search_hybrid(q, user_id, page, page_size)
     return [p.to_dict() for p in results] if results else []
 
 # --- 사용자 상호작용 기록 & user vector 갱신 ---
@@ -455,51 +516,97 @@ async def log_interaction(payload : dict) :
         inter = Interaction(**payload)
         session.add(inter)
         await session.commit()
-        # interaction이 기록될 때마다 user_vector를 실시간으로 업데이트
-        await update_user_embedding(payload["member_id"])
+        seen_posts.add(payload["member_id"], payload["post_id"])
+        # user_vector 갱신은 백그라운드 워커에 맡기고 바로 반환
+        user_embedding_worker.submit(payload["member_id"])
     return {"status" : "ok"}
 
 # 전체 게시글 목록 반환 (태그 필터링 포함)
+POST_FIELDS = ("post_id", "member_id", "category", "title", "content", "image", "views", "created_at", "tags")
+
+# 커서는 마지막 게시글의 (created_at, post_id) 를 base64 로 감싼 문자열
+def _encode_cursor (post) :
+    raw = f"{post.created_at.isoformat()}|{post.post_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor (cursor : str) :
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(post_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail={"error": "잘못된 cursor 입니다."})
+
+def _project_post (post, fields) :
+    data = {}
+    for field in fields:
+        if field == "created_at":
+            data[field] = post.created_at.isoformat()
+        elif field == "tags":
+            data[field] = [tag.tag_id for tag in post.tags] if post.tags else []
+        else:
+            data[field] = getattr(post, field)
+    data["id"] = post.post_id  # 프론트엔드에서 기대하는 id 필드 추가
+    return data
+
+# 게시글 목록
+# limit 이 없으면 기존처럼 전체 목록(list), 있으면 (created_at, post_id) keyset 페이지를
+# {"posts", "next_cursor"[, "total"]} 로 반환. fields 는 "title,views" 처럼 쉼표로 구분
 @app.get("/api/posts")
-async def get_posts(tag: int = None):
-    async for session in get_session():
-        q = select(Post).options(selectinload(Post.tags)).order_by(Post.created_at.desc())
-        if tag:
-            q = q.join(PostTag, Post.post_id == PostTag.post_id).where(PostTag.tag_id == tag)
-        result = await session.execute(q)
-        posts = result.scalars().all()
-        # 데이터 구조를 일관성 있게 맞춤
-        return [{
-            **p.to_dict(),
-            "id": p.post_id  # 프론트엔드에서 기대하는 id 필드 추가
-        } for p in posts]
+async def get_posts(tag: int = None, limit: int = None, cursor: str = None, fields: str = None, with_total: bool = False):
+    fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(POST_FIELDS)
+    unknown = [f for f in fields if f not in POST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail={"error": f"알 수 없는 필드: {unknown}"})
+    if limit is not None and limit <= 0:
+        raise HTTPException(status_code=400, detail={"error": "limit 은 1 이상이어야 합니다."})
+
+    # 요청한 컬럼만 로드 (정렬/커서용 post_id, created_at 은 항상 포함)
+    columns = {"post_id", "created_at"} | {f for f in fields if f != "tags"}
+    q = select(Post).options(load_only(*[getattr(Post, c) for c in columns]))
+    if "tags" in fields:
+        q = q.options(selectinload(Post.tags))
+    if tag:
+        q = q.join(PostTag, Post.post_id == PostTag.post_id).where(PostTag.tag_id == tag)
+    if cursor:
+        created_at, post_id = _decode_cursor(cursor)
+        q = q.where(or_(
+            Post.created_at < created_at,
+            and_(Post.created_at == created_at, Post.post_id < post_id)
+        ))
+    q = q.order_by(Post.created_at.desc(), Post.post_id.desc())
+    if limit is not None:
+        q = q.limit(limit + 1)  # 다음 페이지 존재 여부 확인용으로 하나 더
+
+    async for session in get_read_session():
+        posts = (await session.execute(q)).scalars().all()
+
+    if limit is None and cursor is None:
+        return [_project_post(p, fields) for p in posts]
+
+    next_cursor = None
+    if limit is not None and len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = _encode_cursor(posts[-1])
+    page = {"posts": [_project_post(p, fields) for p in posts], "next_cursor": next_cursor}
+    if with_total:
+        page["total"] = await post_counts.get(tag)
+    return page
 
 @app.post("/api/posts/{post_id}/recommend-tags")
 async def recommend_tags_for_post(post_id: int, max_tags: int = 5):
     # 1. 해당 post의 벡터 가져오기 (없으면 생성)
-    post_vec = vec_client.get_embedding(post_id)
+    post_vec = post_vectors.get_embedding(post_id)
     if post_vec is None:
-        async for session in get_session():
+        async for session in get_read_session():
             post = await session.get(Post, post_id)
             if not post:
                 raise HTTPException(status_code=404, detail="게시글 없음")
-            post_vec = vec_client.embed_text(post.content)
-            vec_client.add_embedding(post_id, post_vec)
+            post_vec = await embedder.embed(post.content)
+            post_vectors.add_embedding(post_id, post_vec)
     # 2. 모든 태그 벡터와 유사도 계산
-    async for session in get_session():
-        result = await session.execute(
-            select(Tag.tag_id, Tag.tag_name, TagVector.vector)
-            .join(TagVector, Tag.tag_id == TagVector.tag_id)
-        )
-        tag_vectors = result.all()
-    similarities = []
-    for tag_id, tag_name, vector_json in tag_vectors:
-        tag_vector = json_to_vector(vector_json)
-        if post_vec is not None and tag_vector is not None:
-            similarity = cosine_similarity(post_vec, tag_vector)
-            similarities.append((tag_id, tag_name, similarity))
-    similarities.sort(key=lambda x: x[2], reverse=True)
-    recommended_tags = [tag_name for _, tag_name, _ in similarities[:max_tags]]
+    tag_ids, tag_names, tag_matrix = await tag_cache.get()
+    rows, _ = top_k_similar(post_vec, tag_matrix, max_tags)
+    recommended_tags = [tag_names[row] for row in rows]
     return {"tags": recommended_tags}
 
 
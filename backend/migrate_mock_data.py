@@ -12,10 +12,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.db import engine, Base, AsyncSessionLocal
 from backend.models import Member, Tag, Post, PostTag, TagVector
-from backend.vector_db import FaissClient
-from backend.vector_utils import get_embedding, vector_to_json
-
-vec_client = FaissClient(dim=768)
+from backend.vector_db import vector_store, post_vectors
+from backend.embeddings import embedder
+from backend.vector_utils import get_embedding, vector_to_blob, TAG_VECTOR_DTYPE
+from backend.migrations import run_migrations
 
 # mock-data 읽기
 def load_mock_data():
@@ -37,6 +37,7 @@ async def migrate_mock_data():
     # 1) 테이블 생성 (없으면)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
     
     # 2) mock 데이터 로드
     tags_data, posts_data = load_mock_data()
@@ -49,10 +50,15 @@ async def migrate_mock_data():
         await session.execute(text("DELETE FROM post_tags"))
         await session.execute(text("DELETE FROM tag_vectors"))
         await session.execute(text("DELETE FROM interactions"))
+        await session.execute(text("DELETE FROM user_embeddings"))
+        await session.execute(text("DELETE FROM post_neighbors"))
         await session.execute(text("DELETE FROM posts"))
         await session.execute(text("DELETE FROM tags"))
         await session.execute(text("DELETE FROM members"))
         await session.commit()
+        vector_store.load()
+        vector_store.reset()
+        vector_store.set_model(embedder.name)
         
         # 4) 멤버 생성 (기본 사용자)
         members = [Member(username=f"user{i}") for i in range(1, 6)]
@@ -75,12 +81,13 @@ async def migrate_mock_data():
             try:
                 # 태그명을 벡터화
                 tag_vector = get_embedding(tag.tag_name)
-                vector_json = vector_to_json(tag_vector)
                 
                 # TagVector 테이블에 저장
                 tag_vector_record = TagVector(
                     tag_id=tag.tag_id,
-                    vector=vector_json
+                    vector=vector_to_blob(tag_vector),
+                    dtype=TAG_VECTOR_DTYPE,
+                    model=embedder.name
                 )
                 session.add(tag_vector_record)
                 
@@ -129,9 +136,9 @@ async def migrate_mock_data():
         print("태그 매핑 완료")
         
         # 9) FAISS 벡터 추가
-        for post in posts:
-            vec = vec_client.embed_text(post.content)
-            vec_client.add_embedding(post.post_id, vec)
+        vecs = embedder.embed_many([post.content for post in posts])
+        for post, vec in zip(posts, vecs):
+            post_vectors.add_embedding(post.post_id, vec)
         
         print("FAISS 벡터 추가 완료")
         
@@ -162,6 +169,9 @@ async def migrate_mock_data():
             await update_user_embedding(member.member_id)
         
         print("사용자 임베딩 업데이트 완료")
+        
+        vector_store.snapshot()
+        print("벡터 스토어 스냅샷 저장 완료")
     
     print("✅ Mock 데이터 마이그레이션 완료!")
     print(f"  - 태그: {len(tags_data)}개")
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+from sqlalchemy import text
+
+# 프로젝트 루트를 Python 경로에 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.db import engine, Base
+import backend.models  # Base.metadata 에 테이블 등록
+from backend.vector_utils import json_to_vector, vector_to_blob, TAG_VECTOR_DTYPE
+
+# create_all 은 기존 테이블을 바꾸지 않으므로, 스키마 변경은 여기서 멱등하게 적용
+
+def _columns(conn, table : str) -> list[str] :
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+
+def migrate_tag_vectors(conn) :
+    """tag_vectors.vector 의 JSON 텍스트를 float32/float16 BLOB 으로 변환"""
+    if "dtype" not in _columns(conn, "tag_vectors") :
+        conn.exec_driver_sql("ALTER TABLE tag_vectors ADD COLUMN dtype VARCHAR(8) NOT NULL DEFAULT 'float32'")
+    if "model" not in _columns(conn, "tag_vectors") :
+        # 기존 벡터는 어떤 모델로 만들었는지 알 수 없으므로 NULL (시작 시 다시 임베딩됨)
+        conn.exec_driver_sql("ALTER TABLE tag_vectors ADD COLUMN model VARCHAR(200)")
+
+    # SQLite 는 TEXT 로 선언된 기존 컬럼에도 BLOB 을 그대로 저장하므로 테이블 재생성은 필요 없음
+    rows = conn.execute(text("SELECT tag_id, vector FROM tag_vectors WHERE typeof(vector) = 'text'")).all()
+    if not rows :
+        return
+    conn.execute(
+        text("UPDATE tag_vectors SET vector = :vector, dtype = :dtype WHERE tag_id = :tag_id"),
+        [
+            {"tag_id" : tag_id, "vector" : vector_to_blob(json_to_vector(vector_json)), "dtype" : TAG_VECTOR_DTYPE}
+            for tag_id, vector_json in rows
+        ]
+    )
+    print(f"태그 벡터 {len(rows)}개 JSON -> BLOB({TAG_VECTOR_DTYPE}) 변환 완료")
+
+def ensure_indexes(conn) :
+    """모델에 선언된 인덱스 중 기존 테이블에 없는 것을 생성"""
+    for table in Base.metadata.sorted_tables :
+        for index in table.indexes :
+            index.create(conn, checkfirst = True)
+
+def ensure_post_fts(conn) :
+    """
+    posts.title / content 에 대한 FTS5 external-content 인덱스와 동기화 트리거.
+    조회수만 바뀌는 UPDATE 는 트리거 대상(title, content)이 아니므로 색인을 건드리지 않음.
+    """
+    exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'posts_fts'").first()
+    if exists :
+        return
+    try :
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE posts_fts USING fts5("
+            "title, content, content = 'posts', content_rowid = 'post_id', tokenize = 'unicode61')"
+        )
+    except Exception as e :
+        print(f"FTS5 를 사용할 수 없어 키워드 검색 색인을 만들지 않음: {e}")
+        return
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.post_id, new.title, new.content);
+        END""")
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', old.post_id, old.title, old.content);
+        END""")
+    conn.exec_driver_sql("""
+        CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', old.post_id, old.title, old.content);
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.post_id, new.title, new.content);
+        END""")
+    # 기존 게시글 색인
+    conn.exec_driver_sql("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+    print("게시글 FTS5 색인 생성 완료")
+
+def migrate_interactions_autoincrement(conn) :
+    """
+    interactions 를 AUTOINCREMENT 테이블로 다시 만듦 (행 복사 후 교체).
+    AUTOINCREMENT 가 없으면 맨 위 행이 지워질 때 그 id 가 재사용되어 user_embeddings 워터마크와 겹친다.
+    """
+    sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'interactions'").scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper() :
+        return
+    table = backend.models.Interaction.__table__
+    old_columns = set(_columns(conn, "interactions"))
+    columns = ", ".join(column.name for column in table.columns if column.name in old_columns)
+
+    conn.exec_driver_sql("ALTER TABLE interactions RENAME TO interactions_old")
+    # 인덱스 이름은 이름을 바꾼 테이블에 그대로 남으므로 먼저 지워야 새 테이블에 만들 수 있음
+    indexes = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'interactions_old' AND sql IS NOT NULL"
+    ).all()
+    for (name,) in indexes :
+        conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    table.create(conn)
+    conn.exec_driver_sql(f"INSERT INTO interactions ({columns}) SELECT {columns} FROM interactions_old")
+    conn.exec_driver_sql("DROP TABLE interactions_old")
+
+    # 이미 지워진 id 까지 워터마크로 쓰였을 수 있으므로 다음 id 는 그보다 크게
+    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'interactions'")
+    conn.exec_driver_sql("""
+        INSERT INTO sqlite_sequence (name, seq) SELECT 'interactions', MAX(
+            COALESCE((SELECT MAX(interaction_id) FROM interactions), 0),
+            COALESCE((SELECT MAX(last_interaction_id) FROM user_embeddings), 0)
+        )""")
+    print("interactions 테이블 AUTOINCREMENT 로 재생성 완료")
+
+def run_migrations(conn) :
+    migrate_tag_vectors(conn)
+    migrate_interactions_autoincrement(conn)
+    ensure_indexes(conn)
+    ensure_post_fts(conn)
+
+async def migrate() :
+    async with engine.begin() as conn :
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+
+if __name__ == "__main__" :
+    asyncio.run(migrate())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from backend.db import Base
 from datetime import datetime, timezone
@@ -19,11 +19,18 @@ class TagVector (Base) :
     
     __tablename__ = "tag_vectors"
     tag_id = Column(Integer, ForeignKey("tags.tag_id"), primary_key = True)
-    vector = Column(Text, nullable = False)  # JSON 형태로 벡터 저장
+    vector = Column(LargeBinary, nullable = False)  # float32 / float16 바이트로 벡터 저장
+    dtype  = Column(String(8), nullable = False, default = "float32")
+    model  = Column(String(200), nullable = True)  # 벡터를 만든 임베딩 모델 (embedder.name), 예전 행은 NULL
 
 class Post (Base) :
     
     __tablename__ = "posts"
+    __table_args__ = (
+        # 최신 / 인기 목록 (post_id 는 동률 정렬용)
+        Index("ix_posts_created_at_post_id", "created_at", "post_id"),
+        Index("ix_posts_views_post_id", "views", "post_id"),
+    )
     post_id    = Column(Integer, primary_key = True, index = True)
     member_id  = Column(Integer, ForeignKey("members.member_id"), nullable = False)
     category   = Column(Text, nullable = False)
@@ -31,8 +38,8 @@ class Post (Base) :
     content    = Column(Text, nullable = False)
     image      = Column(String(500), nullable=True)
     views      = Column(Integer, default = 0, nullable = False)
-    created_at = Column(DateTime, default = datetime.now(timezone.utc))
-    updated_at = Column(DateTime, onupdate = datetime.now(timezone.utc))
+    created_at = Column(DateTime, default = lambda : datetime.now(timezone.utc))
+    updated_at = Column(DateTime, onupdate = lambda : datetime.now(timezone.utc))
 
     tags = relationship("Tag", secondary = "post_tags", backref = "posts")
 
@@ -58,9 +65,32 @@ class PostTag (Base) :
 class Interaction (Base) :
     
     __tablename__ = "interactions"
+    __table_args__ = (
+        # 사용자별 워터마크 이후 interaction 조회용
+        Index("ix_interactions_member_id_interaction_id", "member_id", "interaction_id"),
+        # 지운 id 를 재사용하지 않도록 (재사용되면 user_embeddings 워터마크가 새 interaction 을 건너뜀)
+        {"sqlite_autoincrement" : True},
+    )
     interaction_id = Column(Integer, primary_key = True, index = True)
     member_id      = Column(Integer, ForeignKey("members.member_id"), nullable = False)
     post_id        = Column(Integer, ForeignKey("posts.post_id"), nullable = False)
     action_type    = Column(String(20), nullable = False)
     weight         = Column(Float, nullable = False)
-    created_at     = Column(DateTime, default = datetime.now(timezone.utc))
+    created_at     = Column(DateTime, default = lambda : datetime.now(timezone.utc))
+
+class UserEmbedding (Base) :
+    
+    __tablename__ = "user_embeddings"
+    member_id           = Column(Integer, ForeignKey("members.member_id"), primary_key = True)
+    vector              = Column(LargeBinary, nullable = False)  # float32 바이트 (decay 모드면 정규화 전 가중합)
+    mode                = Column(String(10), nullable = False)
+    last_interaction_id = Column(Integer, nullable = False, default = 0)  # 여기까지 반영됨 (워터마크)
+    ref_time            = Column(Float, nullable = False, default = 0.0)  # decay 기준 시각 (epoch 초)
+
+class PostNeighbor (Base) :
+    
+    __tablename__ = "post_neighbors"
+    post_id      = Column(Integer, ForeignKey("posts.post_id"), primary_key = True)
+    neighbor_ids = Column(LargeBinary, nullable = False)  # int64 바이트 (유사도 내림차순)
+    scores       = Column(LargeBinary, nullable = False)  # float32 바이트 (코사인 유사도)
+    built_at     = Column(DateTime, default = lambda : datetime.now(timezone.utc))
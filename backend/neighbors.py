@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sys
+import faiss
+import numpy as np
+from sqlalchemy import select, delete, insert, func
+
+# 프로젝트 루트를 Python 경로에 추가 (python backend/neighbors.py 로 전체 재계산할 때)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.db import get_session, get_read_session
+from backend.models import PostNeighbor
+from backend.vector_db import post_vectors
+
+# 게시글마다 저장할 이웃 수
+POST_NEIGHBOR_K = int(os.environ.get("POST_NEIGHBOR_K", "20"))
+# 전체 재계산 주기 (초) - 증분 갱신으로 생기는 오차(지워진 이웃, 바뀐 점수)를 정리
+POST_NEIGHBOR_REBUILD_INTERVAL = float(os.environ.get("POST_NEIGHBOR_REBUILD_INTERVAL", "3600"))
+
+def _pack(ids, scores) -> tuple[bytes, bytes] :
+    return np.asarray(ids, dtype = "int64").tobytes(), np.asarray(scores, dtype = "float32").tobytes()
+
+def _unpack(row) -> tuple[np.ndarray, np.ndarray] :
+    return np.frombuffer(row.neighbor_ids, dtype = "int64"), np.frombuffer(row.scores, dtype = "float32")
+
+def compute_all_neighbors(ids : np.ndarray, vectors : np.ndarray, k : int, chunk : int = 1024) :
+    """
+    모든 게시글의 top-k 이웃을 청크 단위 내적 kNN 으로 계산 (posts 컬렉션은 정규화된 cosine 벡터).
+    자기 자신은 제외하고 (post_id, 이웃 id 배열, 점수 배열) 을 yield.
+    """
+    k = min(k + 1, len(ids))
+    for start in range(0, len(ids), chunk) :
+        D, I = faiss.knn(vectors[start:start + chunk], vectors, k, metric = faiss.METRIC_INNER_PRODUCT)
+        for offset in range(len(I)) :
+            row = start + offset
+            keep = (I[offset] >= 0) & (I[offset] != row)
+            yield int(ids[row]), ids[I[offset][keep]][:k - 1], D[offset][keep][:k - 1]
+
+async def get_neighbors(post_id : int) -> tuple[np.ndarray, np.ndarray] | None :
+    """저장된 이웃 (id 배열, 점수 배열), 아직 계산되지 않았으면 None"""
+    async for session in get_read_session() :
+        row = await session.get(PostNeighbor, post_id)
+        return _unpack(row) if row else None
+
+class PostNeighborWorker :
+    """
+    post_neighbors 테이블 관리.
+    - 전체 재계산: 시작 시 테이블이 비어 있거나 rebuild_interval 이 지나면 모든 벡터로 다시 계산
+    - 증분 갱신: 게시글 벡터가 생기거나 바뀌면 submit() → 그 게시글의 이웃을 검색하고,
+      찾은 이웃들의 목록에도 이 게시글을 끼워 넣음 (이웃 관계는 대부분 대칭이므로)
+    두 작업 모두 하나의 백그라운드 태스크에서 순서대로 실행된다.
+    """
+
+    def __init__(self, k : int = 20, rebuild_interval : float = 3600, debounce : float = 0.5) :
+
+        self.k = k
+        self.rebuild_interval = rebuild_interval
+        self.debounce = debounce
+        self._pending : dict[int, None] = {}
+        self._wakeup = asyncio.Event()
+
+    def submit(self, post_id : int) :
+        self._pending[int(post_id)] = None
+        self._wakeup.set()
+
+    def _rebuild_rows(self, ids : np.ndarray, vectors : np.ndarray) -> list[dict] :
+        rows = []
+        for post_id, n_ids, n_scores in compute_all_neighbors(ids, vectors, self.k) :
+            packed_ids, packed_scores = _pack(n_ids, n_scores)
+            rows.append({"post_id" : post_id, "neighbor_ids" : packed_ids, "scores" : packed_scores})
+        return rows
+
+    async def rebuild(self) :
+        """모든 게시글 벡터로 이웃 테이블 전체 재계산 (kNN 계산은 스레드에서)"""
+        ids, vectors = await asyncio.to_thread(post_vectors.arrays)
+        rows = await asyncio.to_thread(self._rebuild_rows, ids, vectors)
+        async for session in get_session() :
+            await session.execute(delete(PostNeighbor))
+            if rows :
+                await session.execute(insert(PostNeighbor), rows)
+            await session.commit()
+        print(f"게시글 이웃 전체 재계산 완료: {len(rows)}개")
+
+    async def refresh(self, post_ids : list[int]) :
+        """지정한 게시글들의 이웃을 다시 검색하고 역방향 목록에 반영"""
+        async for session in get_session() :
+            for post_id in post_ids :
+                vec = post_vectors.get_embedding(post_id)
+                if vec is None :
+                    continue
+                n_ids, n_scores = post_vectors.search(vec, self.k + 1)
+                keep = n_ids != post_id
+                n_ids, n_scores = n_ids[keep][:self.k], n_scores[keep][:self.k]
+
+                row = await session.get(PostNeighbor, post_id)
+                packed_ids, packed_scores = _pack(n_ids, n_scores)
+                if row :
+                    row.neighbor_ids, row.scores = packed_ids, packed_scores
+                else :
+                    session.add(PostNeighbor(post_id = post_id, neighbor_ids = packed_ids, scores = packed_scores))
+
+                # 이웃들의 목록에 이 게시글을 (새 점수로) 다시 끼워 넣음
+                result = await session.execute(
+                    select(PostNeighbor).where(PostNeighbor.post_id.in_(n_ids.tolist()))
+                )
+                score_by_id = dict(zip(n_ids.tolist(), n_scores.tolist()))
+                for other in result.scalars().all() :
+                    o_ids, o_scores = _unpack(other)
+                    keep = o_ids != post_id
+                    o_ids = np.append(o_ids[keep], post_id)
+                    o_scores = np.append(o_scores[keep], score_by_id[other.post_id])
+                    order = np.argsort(-o_scores, kind = "stable")[:self.k]
+                    other.neighbor_ids, other.scores = _pack(o_ids[order], o_scores[order])
+            await session.commit()
+
+    async def _flush(self) :
+        while self._pending :
+            batch = list(self._pending)
+            self._pending.clear()
+            try :
+                await self.refresh(batch)
+            except Exception as e :
+                print(f"게시글 이웃 갱신 오류 ({batch}): {e}")
+
+    async def _is_empty(self) -> bool :
+        async for session in get_read_session() :
+            return not (await session.execute(select(func.count()).select_from(PostNeighbor))).scalar()
+
+    async def run(self) :
+        """lifespan 에서 백그라운드 태스크로 실행"""
+        if await self._is_empty() :
+            await self.rebuild()
+        loop = asyncio.get_running_loop()
+        next_rebuild = loop.time() + self.rebuild_interval
+        while True :
+            try :
+                await asyncio.wait_for(self._wakeup.wait(), timeout = max(next_rebuild - loop.time(), 0))
+            except asyncio.TimeoutError :
+                try :
+                    await self.rebuild()
+                except Exception as e :
+                    print(f"게시글 이웃 재계산 오류: {e}")
+                next_rebuild = loop.time() + self.rebuild_interval
+                continue
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            await self._flush()
+
+    async def drain(self) :
+        """종료 시 남은 갱신 처리"""
+        await self._flush()
+
+# 프로세스 전역 이웃 관리자
+neighbor_worker = PostNeighborWorker(k = POST_NEIGHBOR_K, rebuild_interval = POST_NEIGHBOR_REBUILD_INTERVAL)
+
+if __name__ == "__main__" :
+    # 오프라인 전체 재계산: python backend/neighbors.py
+    from backend.vector_db import vector_store
+    vector_store.load()
+    asyncio.run(neighbor_worker.rebuild())
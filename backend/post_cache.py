@@ -0,0 +1,171 @@
+import asyncio
+from sqlalchemy import select, func
+from backend.db import get_read_session
+from backend.models import Post, PostTag
+from backend.recommendations import get_latest_and_popular
+
+class TopPostsCache :
+    """
+    최신 / 조회수 상위 size 개 게시글의 to_dict() 결과를 메모리에 보관.
+    첫 get() 에서 DB 를 한 번 읽고, 이후에는 게시글 생성/수정/삭제와 조회수 증가 시
+    upsert / remove / set_views 로 목록을 직접 갱신한다.
+    size 보다 많이 잘려나간 적이 있는데 목록이 요청 개수보다 짧아지면 DB 에서 다시 채운다.
+    """
+
+    def __init__(self, size : int = 50) :
+
+        self.size = size
+        self._lock = asyncio.Lock()
+        self._version = 0
+        self._clear()
+        self._loaded = False
+
+    def _clear(self) :
+        self._payloads : dict[int, dict] = {}
+        self._latest : list[int] = []
+        self._popular : list[int] = []
+        # True 이면 DB 의 모든 게시글이 캐시에 들어 있음 (잘려나간 게시글 없음)
+        self._exhaustive = False
+
+    def __contains__(self, post_id : int) :
+        return post_id in self._payloads
+
+    # 정렬 기준은 get_latest_and_popular 의 서브쿼리와 동일 (내림차순)
+    def _latest_key(self, post_id : int) :
+        return (self._payloads[post_id]["created_at"], post_id)
+
+    def _popular_key(self, post_id : int) :
+        return (self._payloads[post_id]["views"], post_id)
+
+    async def _fill(self) :
+        version = self._version
+        latest, popular = await get_latest_and_popular(self.size)
+        # 채우는 중에 invalidate 되었다면 다음 호출에서 다시 읽음
+        if version != self._version :
+            return False
+        self._clear()
+        for post in latest + popular :
+            self._payloads[post.post_id] = post.to_dict()
+        self._latest = [post.post_id for post in latest]
+        self._popular = [post.post_id for post in popular]
+        self._exhaustive = len(latest) < self.size
+        self._loaded = True
+        print(f"최신/인기 게시글 캐시 로드: {len(self._payloads)}개")
+        return True
+
+    async def get(self, top_n : int = 3) :
+        """(최신 게시글 dict 목록, 인기 게시글 dict 목록) 반환"""
+        if top_n > self.size :
+            latest, popular = await get_latest_and_popular(top_n)
+            return [p.to_dict() for p in latest], [p.to_dict() for p in popular]
+        if not self._loaded or (not self._exhaustive and len(self._latest) < top_n) :
+            async with self._lock :
+                if not self._loaded or (not self._exhaustive and len(self._latest) < top_n) :
+                    if not await self._fill() :
+                        latest, popular = await get_latest_and_popular(top_n)
+                        return [p.to_dict() for p in latest], [p.to_dict() for p in popular]
+        return (
+            [self._payloads[post_id] for post_id in self._latest[:top_n]],
+            [self._payloads[post_id] for post_id in self._popular[:top_n]]
+        )
+
+    def invalidate(self) :
+        """다음 get() 에서 DB 로부터 다시 로드"""
+        self._version += 1
+        self._loaded = False
+        self._clear()
+
+    def _insert(self, ids : list[int], post_id : int, key) :
+        """내림차순 목록에 삽입하고 size 를 넘으면 꼬리를 잘라냄"""
+        if post_id in ids :
+            ids.remove(post_id)
+        # 꼬리보다 뒤에 오는 게시글은 목록이 전체를 담고 있고 자리가 남을 때만 추가
+        # (그렇지 않으면 DB 에서 그 사이에 있는 게시글이 빠진 목록이 됨)
+        if not (ids and key(post_id) > key(ids[-1])) and (len(ids) >= self.size or not self._exhaustive) :
+            self._exhaustive = False
+            return
+        pos = 0
+        while pos < len(ids) and key(ids[pos]) > key(post_id) :
+            pos += 1
+        ids.insert(pos, post_id)
+        if len(ids) > self.size :
+            ids.pop()
+            self._exhaustive = False
+
+    def _drop_unused(self) :
+        used = set(self._latest) | set(self._popular)
+        for post_id in [post_id for post_id in self._payloads if post_id not in used] :
+            del self._payloads[post_id]
+
+    def upsert(self, payload : dict) :
+        """생성 / 수정된 게시글 반영 (payload 는 Post.to_dict() 결과)"""
+        # 채우는 중이었다면 _fill 이 버전 변화를 보고 결과를 버리도록 항상 먼저 증가
+        self._version += 1
+        if not self._loaded :
+            return  # 아직 로드 전이면 첫 get() 에서 함께 읽힘
+        post_id = payload["post_id"]
+        self._payloads[post_id] = payload
+        self._insert(self._latest, post_id, self._latest_key)
+        self._insert(self._popular, post_id, self._popular_key)
+        self._drop_unused()
+
+    def remove(self, post_id : int) :
+        """삭제된 게시글 제거"""
+        # 첫 _fill 도중에는 _payloads 가 비어 있으므로 버전부터 증가시켜 삭제 전 목록이 저장되지 않게 함
+        self._version += 1
+        if post_id not in self._payloads :
+            return
+        del self._payloads[post_id]
+        for ids in (self._latest, self._popular) :
+            if post_id in ids :
+                ids.remove(post_id)
+
+    def set_views(self, post_id : int, views : int) :
+        """조회수 변경 반영"""
+        if not self._loaded :
+            return
+        payload = self._payloads.get(post_id)
+        if payload is None :
+            if self._exhaustive :
+                return  # 모든 게시글이 캐시에 있으므로 존재하지 않는 게시글
+            # 캐시 밖 게시글이 인기 목록에 들어갈 만큼 조회되면 dict 가 없으므로 다시 로드
+            if not self._popular or (views, post_id) > self._popular_key(self._popular[-1]) :
+                self.invalidate()
+            return
+        self._version += 1
+        payload["views"] = views
+        self._insert(self._popular, post_id, self._popular_key)
+        self._drop_unused()
+
+class PostCountCache :
+    """
+    전체 / 태그별 게시글 수를 메모리에 보관해 목록 API 가 매번 COUNT(*) 를 하지 않도록 함.
+    게시글 생성/수정/삭제 시 invalidate() 로 비운다.
+    """
+
+    def __init__(self) :
+        self._counts : dict = {}
+        self._version = 0
+
+    async def get(self, tag : int = None) -> int :
+        if tag in self._counts :
+            return self._counts[tag]
+        version = self._version
+        q = select(func.count(Post.post_id))
+        if tag :
+            q = q.join(PostTag, Post.post_id == PostTag.post_id).where(PostTag.tag_id == tag)
+        async for session in get_read_session() :
+            count = (await session.execute(q)).scalar()
+        # 세는 중에 invalidate 되었다면 저장하지 않음
+        if version == self._version :
+            self._counts[tag] = count
+        return count
+
+    def invalidate(self) :
+        self._version += 1
+        self._counts = {}
+
+# 프로세스 전역 최신/인기 게시글 캐시
+post_cache = TopPostsCache(size = 50)
+# 프로세스 전역 게시글 수 캐시 (key 는 tag_id, 전체는 None)
+post_counts = PostCountCache()
@@ -1,51 +1,123 @@
-from sqlalchemy import select
+from sqlalchemy import select, or_, and_, union, func, text, column, Integer, Float
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.db import get_session
-from backend.vector_db import FaissClient
-from backend.models import Post, Interaction, Tag, PostTag, TagVector
-from datetime import timedelta
+from backend.db import get_session, get_read_session
+from backend.vector_db import post_vectors, user_vectors
+from backend.models import Post, Interaction, PostTag, UserEmbedding
+from datetime import timedelta, timezone
 import numpy as np
-from sqlalchemy.orm import selectinload
-from backend.vector_utils import get_embedding, json_to_vector, cosine_similarity
+import json
+import os
+import re
+import asyncio
+from sqlalchemy.orm import selectinload, joinedload
+from backend.vector_utils import normalize, top_k_similar, vector_to_blob, blob_to_vector
+from backend.tag_cache import tag_cache
+from backend.neighbors import get_neighbors
+from backend.seen_posts import seen_posts
+from backend.embeddings import embedder
 
-vec_client = FaissClient(dim = 768)
+async def _embed_post_contents (rows) -> dict[int, np.ndarray] :
+    """(post_id, content) 목록을 본문으로 임베딩해 posts 컬렉션에 저장하고 {post_id : 정규화 벡터} 반환"""
+    rows = list(rows)
+    vectors = await asyncio.gather(*[embedder.embed(content) for _, content in rows])
+    created = {}
+    for (post_id, _), vec in zip(rows, vectors):
+        created[post_id] = normalize(vec)
+        post_vectors.add_embedding(post_id, created[post_id])
+        print(f"게시글 {post_id} 벡터 생성 및 저장")
+    return created
+
+async def backfill_post_vectors (all_posts : bool = False) -> list[int] :
+    """
+    벡터 스토어에 없는 게시글 벡터를 본문으로 채움 (스냅샷 손실 / 이전 버전 데이터 복구용).
+    all_posts 면 있는 벡터도 모두 현재 embedder 로 다시 임베딩 (임베딩 모델이 바뀐 경우).
+    """
+    async for session in get_read_session():
+        q = await session.execute(select(Post.post_id, Post.content))
+        rows = q.all()
+    if not rows:
+        return []
+    if all_posts:
+        missing = rows
+    else:
+        _, found = post_vectors.get_embeddings([post_id for post_id, _ in rows])
+        missing = [row for row, ok in zip(rows, found) if not ok]
+    await _embed_post_contents(missing)
+    if missing:
+        print(f"게시글 벡터 보충 완료: {len(missing)}개")
+    return [post_id for post_id, _ in missing]
+
+async def reset_user_embeddings () -> list[int] :
+    """
+    사용자 벡터 상태(워터마크 포함)를 지우고, 처음부터 다시 계산해야 할 사용자 id 반환.
+    게시글 벡터가 다른 모델로 다시 만들어졌을 때 사용 (interaction 이 없는 사용자의 벡터는 삭제).
+    """
+    async for session in get_session():
+        q = await session.execute(select(Interaction.member_id).distinct())
+        user_ids = [row[0] for row in q.all()]
+        await session.execute(text("DELETE FROM user_embeddings"))
+        await session.commit()
+    keep = set(user_ids)
+    for user_id in user_vectors.ids().tolist():
+        if user_id not in keep:
+            user_vectors.delete_embedding(user_id)
+    return user_ids
+
+# 벡터 검색 결과를 게시글로 변환 (posts 컬렉션은 cosine 이므로 점수가 곧 코사인 유사도)
+async def _recs_by_vector (vec, top_n : int) :
+    post_ids, scores = post_vectors.search(vec, top_n)
+    score_by_id = dict(zip(post_ids.tolist(), scores.tolist()))
+    async for session in get_read_session():
+        q = await session.execute(
+            select(Post).options(selectinload(Post.tags)).where(Post.post_id.in_(score_by_id.keys()))
+        )
+        posts = sorted(q.scalars().all(), key=lambda p: -score_by_id[p.post_id])
+        return {
+            "posts": posts,
+            "similarity": None,
+            "tag_name": None,
+            "post_similarities": [round(score_by_id[p.post_id], 4) for p in posts]
+        }
+
+# 기능 4-1: 미리 계산된 벡터 이웃 게시글 (이웃이 아직 계산되지 않았으면 None)
+async def get_similar_posts (post_id : int, top_n : int) :
+    neighbors = await get_neighbors(post_id)
+    if neighbors is None or len(neighbors[0]) == 0:
+        return None
+    score_by_id = dict(zip(neighbors[0].tolist(), neighbors[1].tolist()))
+    async for session in get_read_session():
+        q = await session.execute(
+            select(Post).options(selectinload(Post.tags)).where(Post.post_id.in_(score_by_id.keys()))
+        )
+        # 삭제된 게시글은 IN 조회에서 빠짐
+        posts = sorted(q.scalars().all(), key=lambda p: -score_by_id[p.post_id])[:top_n]
+        return {
+            "posts": posts,
+            "similarity": None,
+            "tag_name": None,
+            "post_similarities": [round(score_by_id[p.post_id], 4) for p in posts]
+        }
 
 # 기능 1: 사용자 기반 추천 (user-based CF) - 태그 기반 추천
 async def get_user_based_recs (user_id : int, top_n : int = 3) :
     
-    # 1. 사용자 벡터를 FAISS에서 직접 가져오기
-    user_vec = vec_client.get_embedding(user_id)
+    # 1. 사용자 벡터를 users 컬렉션에서 가져오기
+    user_vec = user_vectors.get_embedding(user_id)
     if user_vec is None:
-        user_vec = vec_client.embed_text(f"user:{user_id}")
-        vec_client.add_embedding(user_id, user_vec)
+        user_vec = await embedder.embed(f"user:{user_id}")
+        user_vectors.add_embedding(user_id, user_vec)
     
     # 2. 모든 태그 벡터와 사용자 벡터의 유사도 계산
-    async for session in get_session():
-        result = await session.execute(
-            select(Tag.tag_id, Tag.tag_name, TagVector.vector)
-            .join(TagVector, Tag.tag_id == TagVector.tag_id)
-        )
-        tag_vectors = result.all()
+    tag_ids, tag_names, tag_matrix = await tag_cache.get()
     
-    if not tag_vectors:
+    if len(tag_ids) == 0:
         # 태그 벡터가 없으면 기존 방식 사용
-        post_ids = vec_client.query(user_vec, top_n)
-        async for session in get_session():
-            q = await session.execute(
-                select(Post).options(selectinload(Post.tags)).where(Post.post_id.in_(post_ids))
-            )
-            return {"posts": q.scalars().all(), "similarity": None, "tag_name": None}
+        return await _recs_by_vector(user_vec, top_n)
     
-    tag_vectors = tag_vectors or []
-    similarities = []
-    for tag_id, tag_name, vector_json in tag_vectors:
-        tag_vector = json_to_vector(vector_json)
-        if user_vec is not None and tag_vector is not None:
-            similarity = cosine_similarity(user_vec, tag_vector)
-            similarities.append((tag_id, tag_name, similarity))
-    
-    similarities = similarities or []
-    similarities.sort(key=lambda x: x[2], reverse=True)
+    # 상위 3개 태그만 필요 (가장 유사한 태그 + 게시글이 부족할 때 쓸 2개)
+    rows, scores = top_k_similar(user_vec, tag_matrix, 3)
+    similarities = [(int(tag_ids[row]), tag_names[row], float(score)) for row, score in zip(rows, scores)]
     if len(similarities) > 0:
         most_similar_tag_id = similarities[0][0]
         most_similar_tag_name = similarities[0][1]
@@ -53,7 +125,7 @@ async def get_user_based_recs (user_id : int, top_n : int = 3) :
         print(f"사용자 {user_id}에게 가장 유사한 태그: {most_similar_tag_name} (유사도: {most_similar_score:.4f})")
         
         # 해당 태그를 가진 게시글들 조회
-        async for session in get_session():
+        async for session in get_read_session():
             result = await session.execute(
                 select(Post).options(selectinload(Post.tags))
                 .join(PostTag, Post.post_id == PostTag.post_id)
@@ -82,25 +154,17 @@ async def get_user_based_recs (user_id : int, top_n : int = 3) :
                 posts.extend(additional_posts)
             
             # 각 게시글별 태그 벡터와의 유사도 계산
-            tag_vector = None
-            for tid, tname, vjson in tag_vectors:
-                if tid == most_similar_tag_id:
-                    tag_vector = json_to_vector(vjson)
-                    break
+            tag_vector = tag_matrix[rows[0]]
             post_similarities = []
             if tag_vector is not None and len(posts) > 0:
-                for post in posts[:top_n]:
-                    post_vec = vec_client.get_embedding(post.post_id)
-                    if post_vec is None:
-                        post_vec = get_embedding(f"post:{post.post_id}")
-                        if post_vec is not None:
-                            vec_client.add_embedding(post.post_id, post_vec)
-                    if post_vec is not None and user_vec is not None:
-                        assert user_vec is not None and post_vec is not None, "user_vec/post_vec None 오류"
-                        sim = cosine_similarity(post_vec, tag_vector)
-                        post_similarities.append(round(float(sim), 4))
-                    else:
-                        post_similarities.append(None)
+                # 게시글 벡터를 한 번에 조회 (없는 것만 새로 생성), 저장된 벡터는 이미 정규화됨
+                post_vecs, found = post_vectors.get_embeddings([post.post_id for post in posts[:top_n]])
+                missing = [i for i in range(len(found)) if not found[i]]
+                created = await _embed_post_contents([(posts[i].post_id, posts[i].content) for i in missing])
+                for i in missing:
+                    post_vecs[i] = created[posts[i].post_id]
+                sims = post_vecs @ tag_vector
+                post_similarities = [round(float(sim), 4) for sim in sims]
             else:
                 post_similarities = [None for _ in posts[:top_n]]
             return {
@@ -113,16 +177,11 @@ async def get_user_based_recs (user_id : int, top_n : int = 3) :
         # similarities가 비어있으면 기존 방식 사용
         if user_vec is None:
             return {"posts": [], "similarity": None, "tag_name": None}
-        post_ids = vec_client.query(user_vec, top_n)
-        async for session in get_session():
-            q = await session.execute(
-                select(Post).options(selectinload(Post.tags)).where(Post.post_id.in_(post_ids))
-            )
-            return {"posts": q.scalars().all(), "similarity": None, "tag_name": None}
+        return await _recs_by_vector(user_vec, top_n)
 
 # 기능 2: 최신 게시글
 async def get_latest_posts (top_n : int = 3) :
-    async for session in get_session() :
+    async for session in get_read_session() :
         q = await session.execute(
             select(Post).options(selectinload(Post.tags)).order_by(Post.created_at.desc()).limit(top_n)
         )
@@ -131,60 +190,123 @@ async def get_latest_posts (top_n : int = 3) :
 # 기능 3: 조회수 높은 게시글
 async def get_top_viewed_posts (top_n : int = 3) :
     
-    async for session in get_session() :
+    async for session in get_read_session() :
         q = await session.execute(
             select(Post).options(selectinload(Post.tags)).order_by(Post.views.desc()).limit(top_n)
         )
         return q.scalars().all()
 
+# 기능 2+3: 최신 / 인기 게시글을 한 번의 SELECT 로 조회
+async def get_latest_and_popular (top_n : int = 3) :
+    """두 목록의 post_id 를 UNION 한 IN 조건으로 한 번에 읽고, 파이썬에서 다시 두 목록으로 나눔"""
+    latest_ids = select(Post.post_id).order_by(Post.created_at.desc(), Post.post_id.desc()).limit(top_n).subquery()
+    popular_ids = select(Post.post_id).order_by(Post.views.desc(), Post.post_id.desc()).limit(top_n).subquery()
+    async for session in get_read_session() :
+        q = await session.execute(
+            select(Post).options(selectinload(Post.tags))
+            .where(Post.post_id.in_(union(select(latest_ids.c.post_id), select(popular_ids.c.post_id))))
+        )
+        posts = q.scalars().all()
+    # 서브쿼리와 같은 정렬 기준을 써야 같은 게시글이 골라짐
+    latest = sorted(posts, key=lambda p: (p.created_at, p.post_id), reverse=True)[:top_n]
+    popular = sorted(posts, key=lambda p: (p.views, p.post_id), reverse=True)[:top_n]
+    return latest, popular
+
 # 기능 4: 포스팅 본 후 추천 (재사용)
+# 본 후 추천에서 현재 게시글 벡터의 비중 (나머지는 사용자 벡터)
+POST_VIEW_BLEND = float(os.environ.get("POST_VIEW_BLEND", "0.7"))
+
 async def get_post_view_recs (user_id : int, post_id : int, top_n : int = 3) :
-    return await get_user_based_recs(user_id, top_n)
+    """
+    현재 게시글 벡터와 사용자 벡터를 섞은 질의로 ANN 검색 한 번.
+    이미 본 게시글(현재 게시글 포함)은 그만큼 더 가져와서 걸러냄.
+    """
+    post_vec = post_vectors.get_embedding(post_id)
+    if post_vec is None:
+        return await get_user_based_recs(user_id, top_n)
+    query = POST_VIEW_BLEND * normalize(post_vec)
+    user_vec = user_vectors.get_embedding(user_id)
+    if user_vec is not None:
+        query = query + (1 - POST_VIEW_BLEND) * normalize(user_vec)
+
+    seen = await seen_posts.get(user_id)
+    seen.add(post_id)
+    post_ids, scores = post_vectors.search(query, top_n + len(seen))
+    score_by_id = {}
+    for pid, score in zip(post_ids.tolist(), scores.tolist()):
+        if pid not in seen:
+            score_by_id[pid] = score
+            if len(score_by_id) >= top_n:
+                break
+
+    async for session in get_read_session():
+        q = await session.execute(
+            select(Post).options(selectinload(Post.tags)).where(Post.post_id.in_(score_by_id.keys()))
+        )
+        posts = sorted(q.scalars().all(), key=lambda p: -score_by_id[p.post_id])
+        return {
+            "posts": posts,
+            "similarity": None,
+            "tag_name": None,
+            "post_similarities": [round(score_by_id[p.post_id], 4) for p in posts]
+        }
+
+# 긴 글은 문단 단위로 나눠 임베딩 (chunk_chars 보다 긴 문단은 다시 자름)
+# 문단 경계는 편집해도 잘 바뀌지 않으므로 수정된 문단만 새로 임베딩되고 나머지는 임베딩 캐시에서 읽힘
+def split_chunks(content: str, chunk_chars: int) -> list[str]:
+    chunks = []
+    for paragraph in content.split("\n\n"):
+        for start in range(0, len(paragraph), chunk_chars):
+            chunks.append(paragraph[start:start + chunk_chars])
+    return chunks or [content]
+
+async def embed_chunked(content: str, chunk_chars: int) -> np.ndarray:
+    """문단 벡터들의 길이 가중 평균 (전체를 한 번에 임베딩한 벡터의 근사)"""
+    chunks = split_chunks(content, chunk_chars)
+    vectors = await asyncio.gather(*[embedder.embed(chunk) for chunk in chunks])
+    weights = np.array([len(chunk) for chunk in chunks], dtype='float32')
+    return normalize(weights @ normalize(np.stack(vectors)))
 
 # 기능 5: LLM 기반 태그 추천 (stub)
-async def suggest_tags_for_content(content: str, max_tags: int = 5):
+DEFAULT_TAGS = ["ai", "머신러닝", "딥러닝", "Python", "데이터분석"]
+
+def with_default_tags(tags: list[str], max_tags: int = 5) -> list[str]:
+    """항상 최대 max_tags개까지 반환 (부족하면 기본 태그로 채움)"""
+    tags = list(tags)[:max_tags]
+    for t in DEFAULT_TAGS:
+        if len(tags) >= max_tags:
+            break
+        if t not in tags:
+            tags.append(t)
+    return tags
+
+async def rank_tags_for_content(content: str, max_tags: int = 5, chunk_chars: int = 0) -> list[str]:
+    """
+    본문과 가장 가까운 태그 최대 max_tags개 (기본 태그로 채우지 않음).
+    임베딩 실패는 예외로 올려서, 캐시하는 쪽이 실패 결과를 저장하지 않게 한다.
+    """
+    if chunk_chars and len(content) > chunk_chars:
+        content_vector = await embed_chunked(content, chunk_chars)
+    else:
+        content_vector = await embedder.embed(content)
+    if content_vector is None:
+        raise ValueError(f"컨텐츠 벡터 생성 실패: {content[:50]}...")
+
+    tag_ids, tag_names, tag_matrix = await tag_cache.get()
+    if len(tag_ids) == 0:
+        return []
+    rows, _ = top_k_similar(content_vector, tag_matrix, max_tags)
+    return [tag_names[row] for row in rows]
+
+async def suggest_tags_for_content(content: str, max_tags: int = 5, chunk_chars: int = 0):
     try:
-        content_vector = get_embedding(content)
-        if content_vector is None:
-            print(f"컨텐츠 벡터 생성 실패: {content[:50]}...")
-            return ["ai", "머신러닝", "딥러닝", "Python", "데이터분석"][:max_tags]
-        
-        async for session in get_session():
-            result = await session.execute(
-                select(Tag.tag_id, Tag.tag_name, TagVector.vector)
-                .join(TagVector, Tag.tag_id == TagVector.tag_id)
-            )
-            tag_vectors = result.all()
-        
-        tag_vectors = tag_vectors or []
-        if not tag_vectors:
-            print("태그 벡터가 없어 기본 태그 반환")
-            return ["ai", "머신러닝", "딥러닝", "Python", "데이터분석"][:max_tags]
-        
-        similarities = []
-        for tag_id, tag_name, vector_json in tag_vectors:
-            tag_vector = json_to_vector(vector_json)
-            if content_vector is not None and tag_vector is not None:
-                similarity = cosine_similarity(content_vector, tag_vector)
-                similarities.append((tag_id, tag_name, similarity))
-        
-        similarities.sort(key=lambda x: x[2], reverse=True)
-        recommended_tags = [tag_name for _, tag_name, _ in similarities[:max_tags]]
-        
-        # 항상 최대 max_tags개까지 반환 (부족하면 기본 태그로 채움)
-        if len(recommended_tags) < max_tags:
-            default_tags = ["ai", "머신러닝", "딥러닝", "Python", "데이터분석"]
-            for t in default_tags:
-                if t not in recommended_tags:
-                    recommended_tags.append(t)
-                if len(recommended_tags) >= max_tags:
-                    break
-        
-        print(f"추천 태그: {recommended_tags}")
-        return recommended_tags
+        recommended_tags = await rank_tags_for_content(content, max_tags, chunk_chars)
     except Exception as e:
         print(f"태그 추천 중 오류 발생: {e}")
-        return ["ai", "머신러닝", "딥러닝", "Python", "데이터분석"][:max_tags]
+        recommended_tags = []
+    recommended_tags = with_default_tags(recommended_tags, max_tags)
+    print(f"추천 태그: {recommended_tags}")
+    return recommended_tags
 
 # 기능 6: 주간 이메일 콘텐츠 생성
 async def generate_weekly_email (user_id : int) :
@@ -192,84 +314,225 @@ async def generate_weekly_email (user_id : int) :
     titles = [p.title for p in recs["posts"]]
     return "이번 주 추천 게시글:\n" + "\n".join(titles)
 
-# 기능 7: 컨텐츠 기반 유사도 검색
+# 검색 공통
+def _fts_query (query : str) -> str :
+    # 단어마다 접두어 검색 ("머신러닝"* 는 "머신러닝을" 도 찾음), 단어들은 OR (순위는 bm25)
+    return " OR ".join(f'"{token}"*' for token in re.findall(r"\w+", query))
+
+async def _vector_search (query : str, limit : int) -> list[int] :
+    return post_vectors.query(await embedder.embed(query), limit)
+
+# 키워드(FTS5) / 벡터 / 사용자 상위 태그 세 순위 목록을 reciprocal-rank fusion 으로 합치고
+# 페이지에 해당하는 게시글만 posts 와 조인해서 돌려주는 한 문장.
+# 벡터 순위는 json 배열로 넘기고, 사용자 태그는 interaction 가중치 합 상위 3개를 서브쿼리로 구한다.
+# 개인화 목록은 키워드 / 벡터 후보 중 사용자 상위 태그를 가진 게시글을 태그 가중치 합으로 정렬한 것.
+_KEYWORD_CTE = """
+    kw_raw AS (
+        SELECT rowid AS post_id, bm25(posts_fts, 2.0, 1.0) AS score
+        FROM posts_fts WHERE posts_fts MATCH :match
+        ORDER BY score LIMIT :depth
+    ),
+    kw AS (SELECT post_id, ROW_NUMBER() OVER (ORDER BY score, post_id) AS rank FROM kw_raw),"""
+_NO_KEYWORD_CTE = """
+    kw AS (SELECT NULL AS post_id, NULL AS rank WHERE 0),"""
+_FUSED_PAGE_SQL = """
+    SELECT page.post_id, page.score FROM (
+        WITH {keyword}
+        vec AS (SELECT CAST(value AS INTEGER) AS post_id, key + 1 AS rank FROM json_each(:vector_ids)),
+        user_tags AS (
+            SELECT pt.tag_id, SUM(i.weight) AS weight
+            FROM interactions i JOIN post_tags pt ON pt.post_id = i.post_id
+            WHERE i.member_id = :user_id
+            GROUP BY pt.tag_id ORDER BY weight DESC LIMIT 3
+        ),
+        personal AS (
+            SELECT pt.post_id, ROW_NUMBER() OVER (ORDER BY SUM(ut.weight) DESC, pt.post_id DESC) AS rank
+            FROM post_tags pt JOIN user_tags ut ON ut.tag_id = pt.tag_id
+            WHERE pt.post_id IN (SELECT post_id FROM kw UNION SELECT post_id FROM vec)
+            GROUP BY pt.post_id
+        ),
+        fused AS (
+            SELECT post_id, SUM(score) AS score FROM (
+                SELECT post_id, :keyword_weight / (:rrf_k + rank) AS score FROM kw
+                UNION ALL SELECT post_id, :vector_weight / (:rrf_k + rank) FROM vec
+                UNION ALL SELECT post_id, :personal_weight / (:rrf_k + rank) FROM personal
+            ) GROUP BY post_id
+        )
+        SELECT fused.post_id, fused.score FROM fused JOIN posts ON posts.post_id = fused.post_id
+        ORDER BY fused.score DESC, fused.post_id DESC
+        LIMIT :limit OFFSET :offset
+    ) AS page"""
+
+RRF_K = 60
+_fts_available = True
+
+async def _fused_page (query : str, vector_ids : list[int], user_id : int | None, depth : int, limit : int, offset : int, weights = (1.0, 1.0, 0.5)) :
+    """RRF 로 합친 순위에서 [offset, offset + limit) 게시글을 태그와 함께 한 번의 DB 왕복으로 조회"""
+    global _fts_available
+    match = _fts_query(query)
+    params = {
+        "match" : match, "depth" : depth, "vector_ids" : json.dumps(vector_ids), "user_id" : user_id,
+        "keyword_weight" : weights[0], "vector_weight" : weights[1], "personal_weight" : weights[2],
+        "rrf_k" : RRF_K, "limit" : limit, "offset" : offset,
+    }
+    use_keyword = bool(match) and _fts_available
+    for attempt in (use_keyword, False) :
+        page = (
+            text(_FUSED_PAGE_SQL.format(keyword = _KEYWORD_CTE if attempt else _NO_KEYWORD_CTE))
+            .columns(column("post_id", Integer), column("score", Float))
+            .subquery("fused_page")
+        )
+        stmt = (
+            select(Post).options(joinedload(Post.tags))
+            .join(page, page.c.post_id == Post.post_id)
+            .order_by(page.c.score.desc(), Post.post_id.desc())
+        )
+        try:
+            async for session in get_read_session():
+                result = await session.execute(stmt, params)
+                return result.unique().scalars().all()
+        except OperationalError as e:
+            if not attempt:
+                raise
+            # FTS5 색인이 없으면 이후로는 벡터 (+ 개인화) 만 사용
+            print(f"키워드 검색 불가: {e}")
+            _fts_available = False
+
+# 기능 7: 컨텐츠 기반 검색 (키워드 + 벡터)
 async def search_content_based (query : str, top_n : int = 6) :
-    q_vec = vec_client.embed_text(query)
-    post_ids = vec_client.query(q_vec, top_n)
-    async for session in get_session():
-        q = await session.execute(select(Post).where(Post.post_id.in_(post_ids)))
-        return q.scalars().all()
+    vector_ids = await _vector_search(query, top_n * 2)
+    return await _fused_page(query, vector_ids, None, top_n * 2, top_n, 0, weights = (1.0, 1.0, 0.0))
 
 # 기능 8: 하이브리드 검색
-async def search_hybrid (query : str, user_id : int, top_n : int = 3) :
-    first = await search_content_based(query, top_n*2)  # 6
-    
-    user_tags = ["머신러닝"]
-    merged_q = query + " " + " ".join(user_tags)
-    m_vec = vec_client.embed_text(merged_q)
-    merged_ids = vec_client.query(m_vec, top_n)
-    async for session in get_session():
-        q2 = await session.execute(select(Post).where(Post.post_id.in_(merged_ids)))
-        second = q2.scalars().all()
-    return first + second
+HYBRID_DEPTH = 100
+# 질의 벡터 검색(FAISS, DB 없음) 후 키워드 검색 / 사용자 태그 개인화 / RRF / 페이지 자르기 / 게시글 조회를 한 문장으로
+async def search_hybrid (query : str, user_id : int, page : int = 1, page_size : int = 6) :
+    page = max(page, 1)
+    # 페이지마다 후보 수가 달라지면 합친 순위가 바뀌어 페이지 사이에 중복/누락이 생기므로
+    # 후보 수는 HYBRID_DEPTH 단위로 고정
+    depth = HYBRID_DEPTH * -(-(page * page_size) // HYBRID_DEPTH)
+    vector_ids = await _vector_search(query, depth)
+    return await _fused_page(query, vector_ids, user_id, depth, page_size, (page - 1) * page_size)
 
 
-# 기능 9: 사용자 임베딩 업데이트
-async def update_user_embedding (user_id : int, dim : int = 768) :
-    print(f"사용자 {user_id} 벡터 업데이트 시작")
-    
-    # 1) interactions 조회
+# 기능 9: 사용자 임베딩 업데이트 (여러 사용자를 한 번에, 워터마크 이후 interaction 만 반영)
+#  - blend : 새 interaction 마다 user_vec = (1 - w) * user_vec + w * post_vec
+#  - decay : 닫힌 형태의 시간 감쇠 가중합 S(t) = Σ w_i * exp(-λ (t - t_i)) * post_vec_i
+#            S 와 기준 시각만 저장해 두면 새 이벤트마다 S = S * exp(-λ Δt) + w * post_vec 로 O(1) 갱신
+USER_EMBEDDING_MODE = os.environ.get("USER_EMBEDDING_MODE", "blend")
+USER_EMBEDDING_HALF_LIFE_DAYS = float(os.environ.get("USER_EMBEDDING_HALF_LIFE_DAYS", "14"))
+
+def _interaction_weight (action_type : str) -> float :
+    view = 0.1 if action_type == 'view' else 0.0
+    like = 0.3 if action_type == 'like' else 0.0
+    comment = 0.6 if action_type == 'comment' else 0.0
+    return (view + like + comment) * 0.1
+
+def _epoch (dt) -> float :
+    # SQLite 에서 읽은 created_at 은 naive UTC
+    if dt is None :
+        return 0.0
+    if dt.tzinfo is None :
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+async def update_user_embeddings (user_ids, dim : int = 768) :
+    user_ids = list(set(user_ids))
+    if not user_ids :
+        return
+    decay_rate = np.log(2) / (USER_EMBEDDING_HALF_LIFE_DAYS * 86400)
+
     async for session in get_session() :
+        # 1) 저장된 상태 (벡터 + 워터마크) 조회, 모드가 바뀌었으면 처음부터 다시 계산
+        q = await session.execute(select(UserEmbedding).where(UserEmbedding.member_id.in_(user_ids)))
+        rows = {state.member_id : state for state in q.scalars().all()}
+        states = {user_id : state for user_id, state in rows.items() if state.mode == USER_EMBEDDING_MODE}
+        # interactions 가 비워져 id 가 다시 1부터 매겨졌으면 워터마크가 사용자의 최대 id 보다 커짐 -> 처음부터 다시 계산
+        if states :
+            q = await session.execute(
+                select(Interaction.member_id, func.max(Interaction.interaction_id))
+                .where(Interaction.member_id.in_(list(states)))
+                .group_by(Interaction.member_id)
+            )
+            latest = dict(q.all())
+            for user_id in list(states) :
+                if states[user_id].last_interaction_id > latest.get(user_id, 0) :
+                    print(f"사용자 {user_id} 워터마크가 interaction 보다 앞서 있어 다시 계산")
+                    del states[user_id]
+        watermarks = {user_id : (states[user_id].last_interaction_id if user_id in states else 0) for user_id in user_ids}
+
+        # 2) 워터마크 이후의 interaction 만 한 번에 조회
         q = await session.execute(
-            select(Interaction).where(Interaction.member_id == user_id)
+            select(Interaction)
+            .where(or_(*[
+                and_(Interaction.member_id == user_id, Interaction.interaction_id > watermark)
+                for user_id, watermark in watermarks.items()
+            ]))
+            .order_by(Interaction.interaction_id)
         )
         inters = q.scalars().all() or []
 
-    if not inters :
-        print(f"사용자 {user_id}의 interaction이 없음")
-        return
+        inters_by_user = {}
+        for inter in inters :
+            inters_by_user.setdefault(inter.member_id, []).append(inter)
+        if not inters_by_user :
+            return
 
-    print(f"사용자 {user_id}의 interaction 개수: {len(inters)}")
-
-    # 2) 최신 user vector (없으면 0벡터)
-    user_vec = vec_client.get_embedding(user_id)
-    if user_vec is None or (hasattr(user_vec, 'shape') and user_vec.shape[0] != dim):
-        user_vec = np.zeros(dim, dtype='float32')
-        print(f"사용자 {user_id} 벡터 초기화 (0벡터)")
-
-    # 3) interaction별로 가중치 적용하여 user vector 업데이트
-    updated_count = 0
-    for inter in (inters or []):
-        view = 0.1 if inter.action_type == 'view' else 0.0
-        like = 0.3 if inter.action_type == 'like' else 0.0
-        comment = 0.6 if inter.action_type == 'comment' else 0.0
-        w = (view + like + comment) * 0.1
-        if w == 0:
-            continue
-        
-        post_vec = vec_client.get_embedding(inter.post_id)
-        if post_vec is None:
-            post_vec = vec_client.embed_text(f"post:{inter.post_id}")
-            if post_vec is not None:
-                vec_client.add_embedding(inter.post_id, post_vec)
-                print(f"게시글 {inter.post_id} 벡터 생성 및 저장")
-        
-        if post_vec is not None and user_vec is not None:
-            assert user_vec is not None and post_vec is not None, "user_vec/post_vec None 오류"
-            user_vec = ((1 - w) * user_vec) + (w * post_vec)
-            updated_count += 1
-            print(f"사용자 {user_id} 벡터 업데이트: {inter.action_type} (가중치: {w:.3f})")
+        # 3) 필요한 게시글 벡터를 한 번에 조회 (없는 것만 새로 생성)
+        post_ids = list({inter.post_id for inter in inters})
+        post_vecs, found = post_vectors.get_embeddings(post_ids)
+        post_rows = {post_id : i for i, post_id in enumerate(post_ids)}
+        missing_ids = [post_id for i, post_id in enumerate(post_ids) if not found[i]]
+        if missing_ids:
+            q = await session.execute(select(Post.post_id, Post.content).where(Post.post_id.in_(missing_ids)))
+            created = await _embed_post_contents(q.all())
+            for post_id, vec in created.items():
+                post_vecs[post_rows[post_id]] = vec
 
-    user_vec = user_vec.astype('float32')
+        updated = {}
+        for user_id, user_inters in inters_by_user.items() :
+            state = states.get(user_id)
+            if state is not None :
+                user_vec = blob_to_vector(state.vector).copy()
+                ref_time = state.ref_time
+            else :
+                user_vec = np.zeros(dim, dtype='float32')
+                ref_time = 0.0
 
-    # 4) 기존 user embedding 삭제 (IndexIDMap 사용 시)
-    try:
-        vec_client.delete_embedding(user_id)
-        print(f"사용자 {user_id} 기존 벡터 삭제")
-    except:
-        print(f"사용자 {user_id} 기존 벡터 삭제 실패 (없을 수 있음)")
+            # 4) 새 interaction 만 순서대로 반영
+            for inter in user_inters:
+                w = _interaction_weight(inter.action_type)
+                if w == 0:
+                    continue
+                post_vec = post_vecs[post_rows[inter.post_id]]
+                if USER_EMBEDDING_MODE == "decay" :
+                    t = _epoch(inter.created_at)
+                    if t > ref_time :
+                        user_vec = user_vec * np.exp(-decay_rate * (t - ref_time))
+                        ref_time = t
+                        user_vec = user_vec + w * post_vec
+                    else :
+                        # 기준 시각보다 먼저 발생한 이벤트는 해당 시점만큼 감쇠해서 더함
+                        user_vec = user_vec + w * np.exp(-decay_rate * (ref_time - t)) * post_vec
+                else :
+                    user_vec = ((1 - w) * user_vec) + (w * post_vec)
 
-    # 5) FAISS에 업데이트
-    vec_client.add_embedding(user_id, user_vec)
-    print(f"사용자 {user_id} 새 벡터 저장 완료 (업데이트된 interaction: {updated_count}개)")
+            if state is None :
+                state = rows.get(user_id)
+                if state is None :
+                    state = UserEmbedding(member_id=user_id)
+                    session.add(state)
+            state.vector = vector_to_blob(user_vec, 'float32')
+            state.mode = USER_EMBEDDING_MODE
+            state.last_interaction_id = user_inters[-1].interaction_id
+            state.ref_time = ref_time
+            updated[user_id] = user_vec
 
+        # 5) 벡터와 워터마크를 함께 커밋한 뒤 users 컬렉션에 반영 (cosine 컬렉션이 정규화)
+        await session.commit()
+        for user_id, user_vec in updated.items() :
+            user_vectors.add_embedding(user_id, user_vec)
+        print(f"사용자 {len(updated)}명 벡터 업데이트 완료 (새 interaction: {len(inters)}개)")
+
+async def update_user_embedding (user_id : int, dim : int = 768) :
+    await update_user_embeddings([user_id], dim)
@@ -4,16 +4,22 @@ from sqlalchemy.orm import sessionmaker
 
 from backend.db import engine, Base, AsyncSessionLocal
 from backend.models import Member, Tag, Post, PostTag, Interaction
-from backend.vector_db import FaissClient
+from backend.vector_db import vector_store, post_vectors
+from backend.embeddings import embedder
+from backend.migrations import run_migrations
 from datetime import datetime, timezone
 
-vec_client = FaissClient(dim = 768)
-
 async def seed() :
     
     # 1) 테이블 생성 (없으면)
     async with engine.begin() as conn :
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+
+    # 기존 벡터 스토어 초기화 (시드 데이터와 ID가 어긋나지 않도록)
+    vector_store.load()
+    vector_store.reset()
+    vector_store.set_model(embedder.name)
 
     # 2) 세션 준비
     async with AsyncSessionLocal() as session :
@@ -45,15 +51,15 @@ async def seed() :
             posts.append(p)
         session.add_all(posts)
         await session.commit()
-        # 태그 매핑 & 포스트 벡터 추가
-        for p in posts:
+        # 태그 매핑 & 포스트 벡터 추가 (임베딩은 한 번에 배치로 계산)
+        vecs = embedder.embed_many([p.content for p in posts])
+        for p, vec in zip(posts, vecs):
             # 임의의 2개 태그 매핑
             chosen = random.sample(tags, 2)
             for t in chosen:
                 session.add(PostTag(post_id = p.post_id, tag_id = t.tag_id))
             # FAISS에 포스트 임베딩 추가
-            vec = vec_client.embed_text(p.content)
-            vec_client.add_embedding(p.post_id, vec)
+            post_vectors.add_embedding(p.post_id, vec)
         await session.commit()
 
         # -- 2.4 사용자 인터랙션 생성
@@ -77,6 +83,8 @@ async def seed() :
         for m in members :
             await update_user_embedding(m.member_id)
 
+    vector_store.snapshot()
+
     print("Seeding Completed : members, tags, posts, interactions, embeddings 모두 추가됨")
 
 if __name__ == "__main__" :
@@ -0,0 +1,65 @@
+import asyncio
+from collections import OrderedDict
+from sqlalchemy import select
+from backend.db import get_read_session
+from backend.models import Interaction
+
+class SeenPosts :
+    """
+    사용자별로 최근에 본(interaction 이 있는) 게시글 id 를 메모리에 보관.
+    사용자를 처음 조회할 때 interactions 에서 최근 per_user 개를 읽고, 이후에는 add() 로만 갱신한다.
+    사용자 수는 max_users 개까지 LRU 로 유지.
+    """
+
+    def __init__(self, per_user : int = 500, max_users : int = 10000) :
+
+        self.per_user = per_user
+        self.max_users = max_users
+        self._seen : OrderedDict[int, OrderedDict[int, None]] = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def _load(self, user_id : int) :
+        async for session in get_read_session() :
+            result = await session.execute(
+                select(Interaction.post_id)
+                .where(Interaction.member_id == user_id)
+                .order_by(Interaction.interaction_id.desc())
+                .limit(self.per_user * 4)  # 같은 게시글에 여러 interaction 이 있을 수 있음
+            )
+            post_ids = [row[0] for row in result.all()]
+        seen = OrderedDict()
+        for post_id in reversed(post_ids) :  # 오래된 것부터 넣어 최근 것이 뒤에 오도록
+            seen.pop(post_id, None)
+            seen[post_id] = None
+        while len(seen) > self.per_user :
+            seen.popitem(last = False)
+        return seen
+
+    def _put(self, user_id : int, seen : OrderedDict) :
+        self._seen[user_id] = seen
+        self._seen.move_to_end(user_id)
+        while len(self._seen) > self.max_users :
+            self._seen.popitem(last = False)
+
+    async def get(self, user_id : int) -> set[int] :
+        """사용자가 본 게시글 id 집합"""
+        user_id = int(user_id)
+        if user_id not in self._seen :
+            async with self._lock :
+                if user_id not in self._seen :
+                    self._put(user_id, await self._load(user_id))
+        self._seen.move_to_end(user_id)
+        return set(self._seen[user_id])
+
+    def add(self, user_id : int, post_id : int) :
+        """interaction 기록 시 호출 (아직 로드 안 된 사용자는 첫 get() 에서 DB 로부터 읽힘)"""
+        seen = self._seen.get(int(user_id))
+        if seen is None :
+            return
+        seen.pop(int(post_id), None)
+        seen[int(post_id)] = None
+        while len(seen) > self.per_user :
+            seen.popitem(last = False)
+
+# 프로세스 전역 사용자별 본 게시글 집합
+seen_posts = SeenPosts(per_user = 500, max_users = 10000)
@@ -0,0 +1,68 @@
+import asyncio
+import hashlib
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from backend.recommendations import rank_tags_for_content, with_default_tags
+from backend.tag_cache import tag_cache
+
+# 0 보다 크면 이 글자 수보다 긴 글은 문단 단위로 임베딩 (수정된 문단만 다시 계산)
+TAG_SUGGEST_CHUNK_CHARS = int(os.environ.get("TAG_SUGGEST_CHUNK_CHARS", "0"))
+
+def normalize_content(content : str) -> str :
+    """캐시 키용 정규화: NFC, 문단 안의 공백/줄바꿈은 한 칸으로, 문단 구분은 빈 줄 하나로"""
+    content = unicodedata.normalize("NFC", content or "")
+    paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n", content)]
+    return "\n\n".join(p for p in paragraphs if p)
+
+class TagSuggestionCache :
+    """
+    태그 추천 결과를 정규화한 본문 해시로 LRU 캐시.
+    같은 키로 동시에 들어온 요청은 진행 중인 계산 하나를 함께 기다린다.
+    태그 목록이 바뀌면(tag_cache.version) 키가 달라지므로 이전 결과는 자연히 밀려남.
+    실패한 계산은 저장하지 않고, 기본 태그 대체는 캐시 밖에서 한다.
+    """
+
+    def __init__(self, max_size : int = 1024, chunk_chars : int = 0) :
+
+        self.max_size = max_size
+        self.chunk_chars = chunk_chars
+        self._results : OrderedDict[bytes, list[str]] = OrderedDict()
+        self._inflight : dict[bytes, asyncio.Future] = {}
+
+    def _key(self, content : str, max_tags : int) -> bytes :
+        raw = f"{tag_cache.version}\0{max_tags}\0{content}"
+        return hashlib.sha256(raw.encode("utf-8")).digest()
+
+    async def get(self, content : str, max_tags : int = 5) -> list[str] :
+        content = normalize_content(content)
+        key = self._key(content, max_tags)
+        if key in self._results :
+            self._results.move_to_end(key)
+            return with_default_tags(self._results[key], max_tags)
+
+        future = self._inflight.get(key)
+        if future is None :
+            future = asyncio.ensure_future(rank_tags_for_content(content, max_tags, self.chunk_chars))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f, key = key : self._done(key, f))
+        # 한 요청이 취소되어도 함께 기다리는 다른 요청의 계산은 계속됨
+        try :
+            tags = await asyncio.shield(future)
+        except Exception as e :
+            print(f"태그 추천 중 오류 발생: {e}")
+            tags = []
+        return with_default_tags(tags, max_tags)
+
+    def _done(self, key : bytes, future : asyncio.Future) :
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None :
+            return
+        self._results[key] = future.result()
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size :
+            self._results.popitem(last = False)
+
+# 프로세스 전역 태그 추천 캐시
+tag_suggestions = TagSuggestionCache(max_size = 1024, chunk_chars = TAG_SUGGEST_CHUNK_CHARS)
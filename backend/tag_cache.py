@@ -0,0 +1,111 @@
+import asyncio
+import numpy as np
+from sqlalchemy import select
+from backend.db import get_read_session
+from backend.models import Tag, TagVector
+from backend.vector_utils import blobs_to_matrix, normalize
+
+class TagMatrixCache :
+    """
+    모든 태그 벡터를 (n_tags, dim) 정규화 float32 행렬과 id / 이름 배열로 메모리에 보관.
+    첫 get() 에서 DB 를 한 번 읽고, 이후에는 태그 생성/삭제 시 upsert / remove 로 갱신한다.
+    갱신은 새 배열로 교체하므로 이미 get() 으로 받은 스냅샷은 바뀌지 않는다.
+    """
+
+    def __init__(self, dim : int = 768) :
+
+        self.dim = dim
+        self._lock = asyncio.Lock()
+        self._version = 0
+        self._clear()
+        self._loaded = False
+
+    def _clear(self) :
+        self.tag_ids = np.zeros(0, dtype = "int64")
+        self.tag_names : list[str] = []
+        self.matrix = np.zeros((0, self.dim), dtype = "float32")
+        self._row : dict[int, int] = {}
+
+    def _set(self, tag_ids, tag_names, matrix) :
+        self.tag_ids = np.asarray(tag_ids, dtype = "int64")
+        self.tag_names = list(tag_names)
+        self.matrix = matrix
+        self._row = {int(tag_id) : row for row, tag_id in enumerate(self.tag_ids.tolist())}
+
+    async def _load(self) :
+        async for session in get_read_session():
+            result = await session.execute(
+                select(Tag.tag_id, Tag.tag_name, TagVector.vector, TagVector.dtype)
+                .join(TagVector, Tag.tag_id == TagVector.tag_id)
+            )
+            rows = result.all()
+        matrix = blobs_to_matrix([row[2] for row in rows], [row[3] for row in rows], self.dim)
+        return [row[0] for row in rows], [row[1] for row in rows], normalize(matrix)
+
+    async def get(self) :
+        """(tag_ids, tag_names, 정규화된 행렬) 반환"""
+        if not self._loaded :
+            async with self._lock :
+                if not self._loaded :
+                    version = self._version
+                    tag_ids, tag_names, matrix = await self._load()
+                    # 로드 중에 invalidate 되었다면 다음 호출에서 다시 읽음
+                    if version == self._version :
+                        self._set(tag_ids, tag_names, matrix)
+                        self._loaded = True
+                    print(f"태그 벡터 캐시 로드: {len(tag_ids)}개")
+                    return np.asarray(tag_ids, dtype = "int64"), tag_names, matrix
+        return self.tag_ids, self.tag_names, self.matrix
+
+    @property
+    def version(self) -> int :
+        """태그 목록이 바뀔 때마다 증가 (태그 기반 결과를 캐시하는 쪽에서 키로 사용)"""
+        return self._version
+
+    def invalidate(self) :
+        """다음 get() 에서 DB 로부터 다시 로드"""
+        self._version += 1
+        self._loaded = False
+        self._clear()
+
+    def upsert(self, tag_id : int, tag_name : str, vector : np.ndarray) :
+        """새 태그 벡터 추가 (이미 있으면 교체)"""
+        # 로드 중이었다면 get() 이 버전 변화를 보고 다시 읽도록 항상 먼저 증가
+        self._version += 1
+        if not self._loaded :
+            return  # 아직 로드 전이면 첫 get() 에서 함께 읽힘
+        vector = normalize(np.asarray(vector, dtype = "float32").reshape(1, -1))
+        row = self._row.get(int(tag_id))
+        if row is None :
+            self._set(
+                np.append(self.tag_ids, tag_id),
+                self.tag_names + [tag_name],
+                np.vstack([self.matrix, vector])
+            )
+        else :
+            matrix = self.matrix.copy()
+            matrix[row] = vector
+            tag_names = list(self.tag_names)
+            tag_names[row] = tag_name
+            self._set(self.tag_ids, tag_names, matrix)
+
+    def remove(self, tag_ids) :
+        """삭제된 태그 제거"""
+        tag_ids = list(tag_ids)
+        if not tag_ids :
+            return
+        # 로드 중이었다면 get() 이 버전 변화를 보고 다시 읽도록 캐시에 없는 id 여도 증가
+        self._version += 1
+        rows = [self._row[int(tag_id)] for tag_id in tag_ids if int(tag_id) in self._row]
+        if not rows :
+            return
+        keep = np.ones(len(self.tag_ids), dtype = bool)
+        keep[rows] = False
+        self._set(
+            self.tag_ids[keep],
+            [name for name, k in zip(self.tag_names, keep) if k],
+            self.matrix[keep]
+        )
+
+# 프로세스 전역 태그 벡터 캐시
+tag_cache = TagMatrixCache(dim = 768)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+from sqlalchemy import select, delete, exists, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_session, get_read_session
+from backend.models import Tag, TagVector, PostTag
+from backend.embeddings import embedder
+from backend.vector_utils import vector_to_blob, TAG_VECTOR_DTYPE
+from backend.tag_cache import tag_cache
+
+# 고아 태그(어떤 게시글에도 연결되지 않은 태그) 전체 정리 주기 (초, 0 이면 주기 정리 안 함)
+TAG_GC_INTERVAL = float(os.environ.get("TAG_GC_INTERVAL", "3600"))
+
+# 태그 이름 / 매핑을 집합 단위로 처리 (태그 개수와 무관하게 문장 수가 일정)
+# commit 은 호출하는 쪽에서 한 번만 한다.
+
+async def prepare_tags (tag_names : list[str]) :
+    """
+    쓰기 트랜잭션 밖에서 할 일: 읽기 세션으로 없는 태그 이름을 찾고 그 벡터를 미리 임베딩.
+    (임베딩 중에 쓰기 잠금을 잡고 있지 않도록 resolve_tags 보다 먼저, flush 전에 호출)
+    반환: (중복 제거된 이름 목록, 새로 만들 {tag_name : vector})
+    """
+    names = list(dict.fromkeys(name for name in tag_names if name))
+    if not names :
+        return [], {}
+    async for session in get_read_session() :
+        result = await session.execute(select(Tag.tag_name).where(Tag.tag_name.in_(names)))
+        existing = {row[0] for row in result.all()}
+    new_names = [name for name in names if name not in existing]
+    # 새 태그 벡터는 한 번의 micro-batch 로 임베딩
+    vectors = await asyncio.gather(*[embedder.embed(name) for name in new_names])
+    return names, dict(zip(new_names, vectors))
+
+async def resolve_tags (session : AsyncSession, prepared) :
+    """
+    prepare_tags 결과로 태그를 tag_id 로 변환하고, 없는 태그는 미리 만든 벡터와 함께 생성.
+    태그 개수와 무관하게 INSERT / SELECT / INSERT 세 문장만 실행한다.
+    반환: ({tag_name : tag_id}, 새로 만든 [(tag_id, tag_name, vector)])
+    """
+    names, new_vectors = prepared
+    if not names :
+        return {}, []
+
+    created = []
+    if new_vectors :
+        # 그 사이 다른 요청이 같은 이름을 만들었을 수 있으므로 INSERT OR IGNORE, 실제로 들어간 행만 반환됨
+        result = await session.execute(
+            sqlite_insert(Tag).values([{"tag_name" : name} for name in new_vectors])
+            .on_conflict_do_nothing(index_elements = ["tag_name"])
+            .returning(Tag.tag_id, Tag.tag_name)
+        )
+        created = [(tag_id, tag_name, new_vectors[tag_name]) for tag_id, tag_name in result.all()]
+        if created :
+            await session.execute(
+                sqlite_insert(TagVector).on_conflict_do_nothing(index_elements = ["tag_id"]),
+                [
+                    {"tag_id" : tag_id, "vector" : vector_to_blob(vector), "dtype" : TAG_VECTOR_DTYPE, "model" : embedder.name}
+                    for tag_id, _, vector in created
+                ]
+            )
+
+    result = await session.execute(select(Tag.tag_name, Tag.tag_id).where(Tag.tag_name.in_(names)))
+    return dict(result.all()), created
+
+async def reembed_tag_vectors () -> int :
+    """
+    벡터가 없거나 다른 임베딩 모델(또는 모델 기록 없음)로 만든 태그를 현재 embedder 로 다시 임베딩.
+    임베딩 백엔드를 바꾼 뒤 태그 점수가 서로 다른 벡터 공간을 비교하지 않도록 시작 시 실행한다.
+    """
+    async for session in get_read_session() :
+        result = await session.execute(
+            select(Tag.tag_id, Tag.tag_name)
+            .outerjoin(TagVector, TagVector.tag_id == Tag.tag_id)
+            .where(or_(TagVector.tag_id.is_(None), TagVector.model.is_(None), TagVector.model != embedder.name))
+        )
+        rows = result.all()
+    if not rows :
+        return 0
+
+    # 임베딩은 쓰기 트랜잭션 밖에서
+    vectors = await asyncio.gather(*[embedder.embed(tag_name) for _, tag_name in rows])
+    stmt = sqlite_insert(TagVector)
+    stmt = stmt.on_conflict_do_update(
+        index_elements = ["tag_id"],
+        set_ = {"vector" : stmt.excluded.vector, "dtype" : stmt.excluded.dtype, "model" : stmt.excluded.model}
+    )
+    async for session in get_session() :
+        await session.execute(stmt, [
+            {"tag_id" : tag_id, "vector" : vector_to_blob(vector), "dtype" : TAG_VECTOR_DTYPE, "model" : embedder.name}
+            for (tag_id, _), vector in zip(rows, vectors)
+        ])
+        await session.commit()
+    tag_cache.invalidate()
+    print(f"태그 벡터 다시 임베딩 완료 ({embedder.name}): {len(rows)}개")
+    return len(rows)
+
+async def add_post_tags (session : AsyncSession, post_id : int, tag_ids) :
+    """post_tags 매핑을 한 번에 추가 (이미 있는 매핑은 무시)"""
+    tag_ids = list(dict.fromkeys(int(tag_id) for tag_id in tag_ids))
+    if not tag_ids :
+        return
+    await session.execute(
+        sqlite_insert(PostTag).on_conflict_do_nothing(index_elements = ["post_id", "tag_id"]),
+        [{"post_id" : post_id, "tag_id" : tag_id} for tag_id in tag_ids]
+    )
+
+async def delete_orphan_tags (session : AsyncSession, tag_ids = None) -> list[tuple[int, str]] :
+    """
+    post_tags 에 매핑이 없는 태그와 그 벡터를 anti-join DELETE 로 한 번에 삭제.
+    tag_ids 가 주어지면 그 태그들만 검사 (게시글 수정/삭제 시), None 이면 전체 검사.
+    삭제된 [(tag_id, tag_name)] 반환. commit 과 tag_cache 갱신은 호출하는 쪽에서 한다.
+    """
+    if tag_ids is not None :
+        tag_ids = list(dict.fromkeys(int(tag_id) for tag_id in tag_ids))
+        if not tag_ids :
+            return []
+
+    vector_orphan = ~exists().where(PostTag.tag_id == TagVector.tag_id)
+    tag_orphan = ~exists().where(PostTag.tag_id == Tag.tag_id)
+    if tag_ids is not None :
+        vector_orphan = vector_orphan & TagVector.tag_id.in_(tag_ids)
+        tag_orphan = tag_orphan & Tag.tag_id.in_(tag_ids)
+
+    # 벡터를 먼저 지워야 tag_vectors -> tags 외래키가 걸려 있어도 안전
+    # (전체 검사 때는 태그 없이 남은 벡터도 함께 정리됨)
+    await session.execute(delete(TagVector).where(vector_orphan))
+    result = await session.execute(
+        delete(Tag).where(tag_orphan).returning(Tag.tag_id, Tag.tag_name)
+        .execution_options(synchronize_session = False)
+    )
+    deleted = [(row[0], row[1]) for row in result.all()]
+    for tag_id, tag_name in deleted :
+        print(f"사용되지 않는 태그 삭제: {tag_name} (ID: {tag_id})")
+    return deleted
+
+async def sweep_orphan_tags () -> int :
+    """고아 태그 전체 정리 (별도 트랜잭션) 후 태그 캐시 갱신"""
+    async for session in get_session() :
+        deleted = await delete_orphan_tags(session)
+        await session.commit()
+    tag_cache.remove([tag_id for tag_id, _ in deleted])
+    return len(deleted)
+
+async def sweep_orphan_tags_periodically (interval : float = TAG_GC_INTERVAL) :
+    """주기적 고아 태그 정리 (lifespan 백그라운드 태스크)"""
+    while True :
+        await asyncio.sleep(interval)
+        try :
+            count = await sweep_orphan_tags()
+            if count :
+                print(f"고아 태그 정리 완료: {count}개")
+        except Exception as e :
+            print(f"고아 태그 정리 오류: {e}")
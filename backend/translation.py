@@ -0,0 +1,64 @@
+import threading
+from backend.inference import run_inference
+
+class Translator :
+    """
+    MarianMT 번역기. 모델은 첫 사용 시(또는 warm_up) 로드하고,
+    입력을 길이순으로 정렬해 batch_size 개씩 번역해서 패딩 낭비를 줄인다.
+    """
+
+    def __init__(self, src_lang : str = "ko", tgt_lang : str = "en", batch_size : int = 8, max_length : int = 512) :
+
+        self.model_name = f"Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool :
+        return self._model is not None
+
+    def _load(self) :
+        if self._model is None :
+            with self._lock :
+                if self._model is None :
+                    from transformers import MarianMTModel, MarianTokenizer
+                    print(f"번역 모델 로드: {self.model_name}")
+                    self._tokenizer = MarianTokenizer.from_pretrained(self.model_name)
+                    model = MarianMTModel.from_pretrained(self.model_name)
+                    model.eval()
+                    self._model = model
+        return self._tokenizer, self._model
+
+    def translate(self, texts : str | list[str]) -> str | list[str] :
+        """텍스트(1개 또는 목록) 번역 - 블로킹 호출이므로 요청 경로에서는 translate_async 사용"""
+        import torch
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        tokenizer, model = self._load()
+
+        # 길이가 비슷한 것끼리 묶어야 배치 안의 패딩이 적음
+        order = sorted(range(len(texts)), key = lambda i : len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size) :
+            rows = order[start:start + self.batch_size]
+            inputs = tokenizer(
+                [texts[i] for i in rows], return_tensors = "pt",
+                padding = True, truncation = True, max_length = self.max_length
+            )
+            with self._lock, torch.inference_mode() :
+                generated = model.generate(**inputs)
+            for i, text in zip(rows, tokenizer.batch_decode(generated, skip_special_tokens = True)) :
+                out[i] = text
+        return out[0] if single else out
+
+    async def translate_async(self, texts : str | list[str]) -> str | list[str] :
+        return await run_inference(self.translate, texts)
+
+    def warm_up(self) :
+        self.translate(["모델 워밍업"])
+
+# 프로세스 전역 한→영 번역기 (모델은 지연 로드)
+translator = Translator("ko", "en")
@@ -1,37 +1,536 @@
 import faiss
 import numpy as np
+import asyncio
+import json
+import os
+import struct
+import threading
+from backend.vector_utils import normalize
+
+# 현재 파일의 디렉토리를 기준으로 스냅샷 경로 설정
+current_dir = os.path.dirname(os.path.abspath(__file__))
+VECTOR_STORE_DIR = os.path.join(current_dir, "vector_store")
+
+# WAL 레코드: op(1바이트) + id(int64), add 레코드는 뒤에 float32 * dim 벡터가 붙음
+_WAL_HEADER = struct.Struct("<cq")
+_WAL_ADD = b"A"
+_WAL_DELETE = b"D"
+
+# 지원하는 인덱스 종류: 정확 검색(flat)과 근사 검색(IVF-Flat, IVF-PQ, HNSW)
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+
+# l2: 제곱 L2 거리(작을수록 가까움), cosine: 삽입 시 정규화 후 내적(클수록 가까움)
+METRICS = ("l2", "cosine")
+
+# ANN 후보를 top_k 의 몇 배까지 뽑아 원본 벡터로 재정렬할지 (PQ 는 근사 거리 오차가 커서 크게)
+DEFAULT_K_FACTORS = {"flat" : 1, "ivf" : 2, "ivfpq" : 8, "hnsw" : 2}
 
 class FaissClient :
-    
-    def __init__(self, dim : int = 768) :
-        
+    """
+    id -> 행 번호 해시 인덱스를 유지하는 벡터 스토어.
+    벡터는 연속된 (capacity, dim) float32 버퍼에 저장되고, 삭제는 마지막 행과 자리를 바꿔
+    get / exists / update / delete 가 모두 O(1)로 동작한다.
+
+    index_type 이 flat 이면 버퍼에 대해 faiss.knn 으로 정확 검색하고, ivf / ivfpq / hnsw 이면
+    버퍼로 학습한 ANN 인덱스에서 top_k * k_factor 개의 후보를 뽑은 뒤 원본 벡터로 재정렬한다. ANN 인덱스는 추가만 하고
+    삭제/갱신된 항목은 stale 로 세어 두었다가 일정 비율을 넘으면 maintain()에서 다시 만든다.
+
+    metric 이 cosine 이면 벡터를 삽입 시점에 한 번만 정규화해 두고 내적으로 검색하므로,
+    search()가 돌려주는 점수가 곧 코사인 유사도이다.
+    """
+
+    def __init__(
+        self,
+        dim : int = 768,
+        path : str | None = None,
+        index_type : str = "flat",
+        metric : str = "l2",
+        nlist : int | None = None,
+        pq_m : int = 48,
+        hnsw_m : int = 32,
+        nprobe : int = 16,
+        ef_search : int = 64,
+        k_factor : int | None = None,
+        ann_min_size : int = 1000,
+        rebuild_ratio : float = 0.2,
+    ) :
+
+        if index_type not in INDEX_TYPES :
+            raise ValueError(f"지원하지 않는 인덱스 종류: {index_type} (가능: {INDEX_TYPES})")
+        if metric not in METRICS :
+            raise ValueError(f"지원하지 않는 metric: {metric} (가능: {METRICS})")
+        if index_type == "ivfpq" and dim % pq_m != 0 :
+            raise ValueError(f"dim({dim})은 pq_m({pq_m})으로 나누어 떨어져야 합니다.")
+
         self.dim = dim
-        self.index = faiss.IndexIDMap(faiss.IndexFlatL2(dim))
+        self.path = path
+        self.index_type = index_type
+        self.metric = metric
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.k_factor = k_factor or DEFAULT_K_FACTORS[index_type]
+        self.ann_min_size = ann_min_size
+        self.rebuild_ratio = rebuild_ratio
+        self.dirty = False
+        # 벡터를 만든 임베딩 모델 이름 (embedder.name) - 바뀌면 시작 시 다시 임베딩
+        self.model : str | None = None
+        self._lock = threading.RLock()
+        self._wal = None
+        self._clear()
+
+    def _clear(self) :
+        self._vectors = np.zeros((0, self.dim), dtype = "float32")
+        self._ids = np.zeros(0, dtype = "int64")
+        self._size = 0
+        self._id_to_row : dict[int, int] = {}
+        self._ann = None
+        self._ann_stale = 0
+        self._ann_trained_size = 0
+        self._ann_pending = None
+
+    def __len__(self) -> int :
+        return self._size
+
+    def __contains__(self, id : int) -> bool :
+        return int(id) in self._id_to_row
+
+    def exists(self, id : int) -> bool :
+        return int(id) in self._id_to_row
+
+    def ids(self) -> np.ndarray :
+        return self._ids[:self._size].copy()
+
+    def vectors(self) -> np.ndarray :
+        """저장된 모든 벡터 (행 순서는 ids()와 동일)"""
+        return self._vectors[:self._size]
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray] :
+        """(ids, 벡터) 복사본을 함께 반환 - 다른 스레드에서 오래 쓸 때 사용"""
+        with self._lock :
+            return self.ids(), self._vectors[:self._size].copy()
 
     def embed_text(self, text : str) -> np.ndarray :
-        rng = np.random.RandomState(abs(hash(text)) % (2**32))
-        
-        return rng.rand(self.dim).astype("float32")
+        """텍스트 임베딩 (동기) - 요청 경로에서는 await embedder.embed() 사용"""
+        from backend.embeddings import embedder
+        return embedder.embed_sync(text)
+
+    def _reserve(self, size : int) :
+        capacity = self._vectors.shape[0]
+        if size <= capacity :
+            return
+        capacity = max(size, capacity * 2, 64)
+        vectors = np.zeros((capacity, self.dim), dtype = "float32")
+        ids = np.zeros(capacity, dtype = "int64")
+        vectors[:self._size] = self._vectors[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._vectors, self._ids = vectors, ids
+
+    def _upsert(self, id : int, vector : np.ndarray) :
+        row = self._id_to_row.get(id)
+        existed = row is not None
+        if row is None :
+            self._reserve(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._ids[row] = id
+            self._id_to_row[id] = row
+        self._vectors[row] = vector
+        if self._ann_pending is not None :
+            self._ann_pending.append(id)
+        if self._ann is not None :
+            self._ann.add_with_ids(self._vectors[row:row + 1], np.array([id], dtype = "int64"))
+            if existed :
+                self._ann_stale += 1
+
+    def _remove(self, id : int) -> bool :
+        row = self._id_to_row.pop(id, None)
+        if row is None :
+            return False
+        if self._ann_pending is not None :
+            self._ann_pending.append(id)
+        if self._ann is not None :
+            self._ann_stale += 1
+        last = self._size - 1
+        if row != last :
+            # 마지막 행을 빈 자리로 옮겨 버퍼를 연속적으로 유지
+            moved_id = int(self._ids[last])
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = moved_id
+            self._id_to_row[moved_id] = row
+        self._size = last
+        return True
+
+    def set_model(self, model : str) :
+        """저장된 벡터를 만든 임베딩 모델 기록 (다음 스냅샷에 저장됨)"""
+        if self.model != model :
+            self.model = model
+            self.dirty = True
+
+    def _prepare(self, vectors : np.ndarray) -> np.ndarray :
+        """저장/질의용 float32 연속 배열로 변환 (cosine 이면 정규화)"""
+        vectors = np.ascontiguousarray(vectors, dtype = "float32")
+        if self.metric == "cosine" :
+            vectors = normalize(vectors)
+        return vectors
 
     def add_embedding(self, id : int, vector : np.ndarray) :
-        
-        self.index.add_with_ids(vector.reshape(1, -1), np.array([id], dtype = "int64"))
+        """벡터 추가 (이미 있는 id면 덮어씀)"""
+        id = int(id)
+        vector = self._prepare(np.asarray(vector).reshape(-1))
+        with self._lock :
+            self._upsert(id, vector)
+            self._log(_WAL_ADD, id, vector)
+
+    def update_embedding(self, id : int, vector : np.ndarray) :
+        self.add_embedding(id, vector)
 
     def delete_embedding(self, id : int) :
         """특정 ID의 임베딩을 삭제"""
-        try:
-            # IndexIDMap에서는 remove_ids를 사용하여 삭제
-            self.index.remove_ids(np.array([id], dtype="int64"))
-        except Exception as e:
-            print(f"임베딩 삭제 중 오류: {e}")
+        id = int(id)
+        with self._lock :
+            if self._remove(id) :
+                self._log(_WAL_DELETE, id)
+
+    def query(self, vector : np.ndarray, top_k : int, nprobe : int | None = None, ef_search : int | None = None, k_factor : int | None = None) :
+        """가장 가까운 top_k 개의 id 리스트 반환 (SQL 바인딩에 바로 쓸 수 있도록 int)"""
+        ids, _ = self.search(vector, top_k, nprobe = nprobe, ef_search = ef_search, k_factor = k_factor)
+        return ids.tolist()
+
+    def search(self, vector : np.ndarray, top_k : int, nprobe : int | None = None, ef_search : int | None = None, k_factor : int | None = None) :
+        """
+        가장 가까운 top_k 개의 (id 배열, 점수 배열) 반환.
+        점수는 l2 면 제곱 거리, cosine 이면 코사인 유사도.
+        nprobe(IVF) / ef_search(HNSW) / k_factor(재정렬 후보 배수)로 질의마다 정확도-속도 균형을 조절할 수 있다.
+        """
+        empty = (np.zeros(0, dtype = "int64"), np.zeros(0, dtype = "float32"))
+        if self._size == 0 or top_k <= 0 :
+            return empty
+        xq = self._prepare(np.asarray(vector).reshape(1, -1))
+        with self._lock :
+            if self._ann is None :
+                D, I = faiss.knn(xq, self._vectors[:self._size], min(top_k, self._size), metric = self._faiss_metric())
+                keep = I[0] >= 0
+                return self._ids[I[0][keep]].copy(), D[0][keep]
+
+            self._set_search_params(nprobe, ef_search)
+            # 재정렬로 근사 순위 밖의 결과도 되찾을 수 있도록 top_k 의 k_factor 배를 뽑고,
+            # 삭제/갱신으로 남은 stale 항목만큼 여유를 더 둠
+            k = top_k * (k_factor or self.k_factor) + min(self._ann_stale, 4 * top_k)
+            k = min(self._ann.ntotal, k)
+            D, I = self._ann.search(xq, k)
+            rows = []
+            seen = set()
+            for id in I[0].tolist() :
+                row = self._id_to_row.get(id) if id >= 0 else None
+                if row is None or row in seen :
+                    continue
+                seen.add(row)
+                rows.append(row)
+            if not rows :
+                return empty
+            rows = np.array(rows, dtype = "int64")
+            # PQ / 그래프 근사 거리 대신 원본 벡터로 정확히 재정렬
+            if self.metric == "cosine" :
+                scores = self._vectors[rows] @ xq[0]
+                order = np.argsort(-scores, kind = "stable")[:top_k]
+            else :
+                scores = ((self._vectors[rows] - xq) ** 2).sum(axis = 1)
+                order = np.argsort(scores, kind = "stable")[:top_k]
+            return self._ids[rows[order]].copy(), scores[order]
+
+    # --- ANN 인덱스 ---
+
+    def _nlist_for(self, n : int) -> int :
+        if self.nlist :
+            return self.nlist
+        # 일반적인 권장값 4 * sqrt(n), 클러스터당 학습 벡터 39개 이상 유지
+        return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+    def _min_train_size(self) -> int :
+        if self.index_type == "ivf" :
+            return max(self.ann_min_size, 39 * (self.nlist or 1))
+        if self.index_type == "ivfpq" :
+            return max(self.ann_min_size, 39 * (self.nlist or 1), 39 * 256)
+        return self.ann_min_size
+
+    def _make_index(self, n : int) :
+        if self.index_type == "ivf" :
+            spec = f"IVF{self._nlist_for(n)},Flat"
+        elif self.index_type == "ivfpq" :
+            spec = f"IVF{self._nlist_for(n)},PQ{self.pq_m}x8"
+        else :
+            spec = f"HNSW{self.hnsw_m}"
+        return faiss.IndexIDMap(faiss.index_factory(self.dim, spec, self._faiss_metric()))
+
+    def _faiss_metric(self) -> int :
+        return faiss.METRIC_INNER_PRODUCT if self.metric == "cosine" else faiss.METRIC_L2
 
-    def query(self, vector : np.ndarray, top_k : int) :
-        D, I = self.index.search(vector.reshape(1, -1), top_k)
-        return I[0] if len(I) > 0 else []
+    def _set_search_params(self, nprobe : int | None, ef_search : int | None) :
+        if self.index_type in ("ivf", "ivfpq") :
+            faiss.extract_index_ivf(self._ann).nprobe = nprobe or self.nprobe
+        elif self.index_type == "hnsw" :
+            faiss.downcast_index(self._ann.index).hnsw.efSearch = ef_search or self.ef_search
+
+    def needs_rebuild(self) -> bool :
+        if self.index_type == "flat" :
+            return False
+        if self._ann is None :
+            return self._size >= self._min_train_size()
+        if self._ann_stale > self.rebuild_ratio * max(self._ann.ntotal, 1) :
+            return True
+        # IVF 는 학습 이후 데이터가 크게 늘면 클러스터를 다시 학습
+        return self.index_type != "hnsw" and self._size > 4 * self._ann_trained_size
+
+    def build_index(self) :
+        """
+        현재 벡터로 ANN 인덱스를 (재)학습. 벡터가 ann_min_size 보다 적으면 flat 검색을 유지한다.
+        학습은 락 밖에서 수행하고, 그동안 들어온 변경은 마지막에 새 인덱스에 반영한다.
+        """
+        if self.index_type == "flat" :
+            return
+        with self._lock :
+            if self._size < self._min_train_size() :
+                self._ann = None
+                return
+            vectors = np.array(self._vectors[:self._size])
+            ids = self._ids[:self._size].copy()
+            self._ann_pending = []
+
+        try :
+            index = self._make_index(len(ids))
+            index.train(vectors)
+            index.add_with_ids(vectors, ids)
+        except Exception :
+            with self._lock :
+                self._ann_pending = None
+            raise
+
+        with self._lock :
+            # 학습 중에 추가/갱신/삭제된 id: 현재 벡터를 다시 넣고, 학습본에 있던 항목은 stale 처리
+            pending = set(self._ann_pending)
+            self._ann_pending = None
+            for id in pending :
+                row = self._id_to_row.get(id)
+                if row is not None :
+                    index.add_with_ids(self._vectors[row:row + 1], np.array([id], dtype = "int64"))
+            self._ann = index
+            self._ann_stale = len(pending.intersection(ids.tolist()))
+            self._ann_trained_size = len(ids)
+        print(f"ANN 인덱스 생성 완료 ({self.index_type}): {index.ntotal}개")
+
+    def maintain(self) :
+        """필요할 때만 ANN 인덱스를 다시 만듦 (백그라운드 스레드에서 호출)"""
+        if self.needs_rebuild() :
+            self.build_index()
 
     def get_embedding(self, id: int):
-        try:
-            idx = self.index.id_map.tolist().index(id)
-            return self.index.reconstruct(id)
-        except Exception:
+        row = self._id_to_row.get(int(id))
+        if row is None :
             return None
+        return self._vectors[row].copy()
+
+    def get_embeddings(self, ids) -> tuple[np.ndarray, np.ndarray] :
+        """
+        여러 id의 벡터를 한 번에 조회.
+        반환: (len(ids), dim) 연속 배열과 존재 여부 마스크 (없는 id의 행은 0벡터)
+        """
+        rows = np.fromiter((self._id_to_row.get(int(i), -1) for i in ids), dtype = "int64")
+        found = rows >= 0
+        out = np.zeros((len(rows), self.dim), dtype = "float32")
+        with self._lock :
+            out[found] = self._vectors[rows[found]]
+        return out, found
+
+    # --- 영속화 (스냅샷 + WAL) ---
+
+    def _file(self, name : str) -> str :
+        return os.path.join(self.path, name)
+
+    def _log(self, op : bytes, id : int, vector : np.ndarray | None = None) :
+        """변경 사항을 WAL에 기록 (스냅샷 이후 변경분만 유지)"""
+        self.dirty = True
+        if self._wal is None :
+            return
+        self._wal.write(_WAL_HEADER.pack(op, id))
+        if vector is not None :
+            self._wal.write(vector.tobytes())
+        self._wal.flush()
+
+    def _open_wal(self) :
+        os.makedirs(self.path, exist_ok = True)
+        self._wal = open(self._file("wal.bin"), "ab")
+
+    def _replay_wal(self) -> int :
+        wal_path = self._file("wal.bin")
+        if not os.path.exists(wal_path) :
+            return 0
+        record_size = self.dim * 4
+        replayed = 0
+        with open(wal_path, "rb") as f :
+            while True :
+                header = f.read(_WAL_HEADER.size)
+                if len(header) < _WAL_HEADER.size :
+                    break
+                op, id = _WAL_HEADER.unpack(header)
+                if op == _WAL_ADD :
+                    payload = f.read(record_size)
+                    if len(payload) < record_size :
+                        break  # 기록 도중 중단된 마지막 레코드는 버림
+                    self._upsert(id, np.frombuffer(payload, dtype = "float32"))
+                else :
+                    self._remove(id)
+                replayed += 1
+        return replayed
+
+    def load(self) :
+        """스냅샷(mmap)과 WAL을 읽어 인덱스를 복원하고 이후 변경을 WAL에 기록"""
+        if self.path is None :
+            return
+        with self._lock :
+            self._clear()
+            vectors_path, ids_path = self._file("vectors.npy"), self._file("ids.npy")
+            if os.path.exists(vectors_path) and os.path.exists(ids_path) :
+                # copy-on-write mmap: 쓰기 전까지는 파일 페이지를 그대로 사용
+                vectors = np.load(vectors_path, mmap_mode = "c")
+                ids = np.load(ids_path)
+                if vectors.ndim == 2 and vectors.shape[1] == self.dim and len(ids) == len(vectors) :
+                    norms = np.linalg.norm(vectors, axis = 1)
+                    if self.metric == "cosine" and not np.all((np.abs(norms - 1) < 1e-3) | (norms == 0)) :
+                        vectors[:] = normalize(vectors)  # 예전 l2 스냅샷이면 한 번만 정규화
+                    self._vectors, self._ids = vectors, ids.astype("int64")
+                    self._size = len(ids)
+                    self._id_to_row = {int(id) : row for row, id in enumerate(self._ids.tolist())}
+            self._load_meta()
+            self._load_ann()
+            replayed = self._replay_wal()
+            self.dirty = replayed > 0
+            if self._wal is None :
+                self._open_wal()
+        print(f"벡터 컬렉션 로드 완료 ({os.path.basename(self.path)}): {self._size}개 (WAL {replayed}건)")
+
+    def _load_meta(self) :
+        meta_path = self._file("meta.json")
+        self.model = None  # 기록이 없는 예전 스냅샷은 모델을 알 수 없음
+        if os.path.exists(meta_path) :
+            with open(meta_path, "r", encoding = "utf-8") as f :
+                self.model = json.load(f).get("model")
+
+    def _save_meta(self) :
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding = "utf-8") as f :
+            json.dump({"model" : self.model}, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _load_ann(self) :
+        ann_path, meta_path = self._file("ann.index"), self._file("ann.json")
+        if self.index_type == "flat" or not (os.path.exists(ann_path) and os.path.exists(meta_path)) :
+            return
+        with open(meta_path, "r", encoding = "utf-8") as f :
+            meta = json.load(f)
+        if meta.get("index_type") != self.index_type or meta.get("metric", "l2") != self.metric :
+            return  # 설정이 바뀌었으면 maintain()에서 새로 학습
+        self._ann = faiss.read_index(ann_path)
+        self._ann_stale = meta.get("stale", 0)
+        self._ann_trained_size = meta.get("trained_size", self._size)
+
+    def _save_ann(self) :
+        ann_path, meta_path = self._file("ann.index"), self._file("ann.json")
+        if self._ann is None :
+            for path in (ann_path, meta_path) :
+                if os.path.exists(path) :
+                    os.remove(path)
+            return
+        faiss.write_index(self._ann, ann_path + ".tmp")
+        os.replace(ann_path + ".tmp", ann_path)
+        meta = {"index_type" : self.index_type, "metric" : self.metric, "stale" : self._ann_stale, "trained_size" : self._ann_trained_size}
+        with open(meta_path, "w", encoding = "utf-8") as f :
+            json.dump(meta, f)
+
+    def snapshot(self) :
+        """현재 인덱스를 디스크에 저장하고 WAL을 비움"""
+        if self.path is None :
+            return
+        with self._lock :
+            os.makedirs(self.path, exist_ok = True)
+            arrays = (("vectors.npy", self._vectors[:self._size]), ("ids.npy", self._ids[:self._size]))
+            for name, array in arrays :
+                tmp_path = self._file(name + ".tmp")
+                with open(tmp_path, "wb") as f :
+                    np.save(f, array)
+                os.replace(tmp_path, self._file(name))
+            self._save_meta()
+            self._save_ann()
+            if self._wal is not None :
+                self._wal.close()
+            open(self._file("wal.bin"), "wb").close()
+            self._open_wal()
+            self.dirty = False
+
+    def reset(self) :
+        """모든 벡터를 비우고 빈 스냅샷으로 덮어씀 (시드/마이그레이션용)"""
+        with self._lock :
+            self._clear()
+            self.dirty = True
+            self.snapshot()
+
+class VectorStore :
+    """
+    이름별 컬렉션(posts, users, tags ...)을 관리하는 벡터 스토어.
+    컬렉션마다 별도의 인덱스와 ID 공간, 스냅샷 디렉토리를 가진다.
+    """
+
+    def __init__(self, dim : int = 768, path : str | None = None) :
+
+        self.dim = dim
+        self.path = path
+        self._collections : dict[str, FaissClient] = {}
+
+    def collection(self, name : str, **options) -> FaissClient :
+        """컬렉션 반환 (처음 만들 때 index_type 등 FaissClient 옵션 지정 가능)"""
+        client = self._collections.get(name)
+        if client is None :
+            path = os.path.join(self.path, name) if self.path is not None else None
+            client = FaissClient(dim = self.dim, path = path, **options)
+            self._collections[name] = client
+        return client
+
+    def load(self) :
+        for client in self._collections.values() :
+            client.load()
+            client.maintain()
+
+    def snapshot(self) :
+        for client in self._collections.values() :
+            client.snapshot()
+
+    def reset(self) :
+        for client in self._collections.values() :
+            client.reset()
+
+    def set_model(self, model : str) :
+        for client in self._collections.values() :
+            client.set_model(model)
+
+    async def persist_periodically(self, interval : float = 30.0) :
+        """변경된 컬렉션만 주기적으로 스냅샷 (lifespan 백그라운드 태스크)"""
+        while True :
+            await asyncio.sleep(interval)
+            for name, client in list(self._collections.items()) :
+                try:
+                    if client.needs_rebuild() :
+                        await asyncio.to_thread(client.build_index)
+                    if client.dirty :
+                        await asyncio.to_thread(client.snapshot)
+                except Exception as e:
+                    print(f"벡터 스냅샷 저장 오류 ({name}): {e}")
+
+# 프로세스 전역 벡터 스토어 (모든 모듈이 같은 컬렉션을 공유)
+# 게시글 검색용 인덱스 종류는 환경변수로 선택 (flat / ivf / ivfpq / hnsw)
+POST_INDEX_TYPE = os.environ.get("POST_INDEX_TYPE", "hnsw")
+
+vector_store = VectorStore(dim = 768, path = VECTOR_STORE_DIR)
+post_vectors = vector_store.collection("posts", index_type = POST_INDEX_TYPE, metric = "cosine")
+user_vectors = vector_store.collection("users", metric = "cosine")
@@ -1,29 +1,14 @@
 import json
+import os
 import numpy as np
-import hashlib
+
+# 태그 벡터 BLOB 저장 형식 (float16 이면 용량이 절반)
+TAG_VECTOR_DTYPE = os.environ.get("TAG_VECTOR_DTYPE", "float32")
 
 def get_embedding(text: str) -> np.ndarray:
-    """텍스트를 간단한 해시 기반 벡터로 변환"""
-    try:
-        # 텍스트를 해시하여 일관된 벡터 생성
-        hash_obj = hashlib.md5(text.encode('utf-8'))
-        hash_hex = hash_obj.hexdigest()
-        
-        # 해시값을 768차원 벡터로 변환
-        vector = np.zeros(768, dtype='float32')
-        for i, char in enumerate(hash_hex):
-            if i < 768:
-                vector[i] = ord(char) / 255.0
-        
-        # 나머지 차원은 해시값의 다른 부분으로 채움
-        for i in range(len(hash_hex), 768):
-            vector[i] = (ord(hash_hex[i % len(hash_hex)]) + i) % 255 / 255.0
-        
-        return vector
-    except Exception as e:
-        print(f"벡터화 중 오류 발생: {e}")
-        # 오류 시 랜덤 벡터 반환
-        return np.random.rand(768).astype('float32')
+    """텍스트 임베딩 (backend.embeddings 에 설정된 백엔드 + 캐시, 동기 호출)"""
+    from backend.embeddings import embedder
+    return embedder.embed_sync(text)
 
 def vector_to_json(vector: np.ndarray) -> str:
     """numpy 벡터를 JSON 문자열로 변환"""
@@ -33,6 +18,32 @@ def json_to_vector(vector_json: str) -> np.ndarray:
     """JSON 문자열을 numpy 벡터로 변환"""
     return np.array(json.loads(vector_json), dtype='float32')
 
+def vector_to_blob(vector: np.ndarray, dtype: str = TAG_VECTOR_DTYPE) -> bytes:
+    """numpy 벡터를 float32/float16 바이트로 변환"""
+    return np.ascontiguousarray(vector, dtype=dtype).tobytes()
+
+def blob_to_vector(blob: bytes, dtype: str = "float32") -> np.ndarray:
+    """바이트를 float32 numpy 벡터로 변환"""
+    return np.frombuffer(blob, dtype=dtype).astype('float32', copy=False)
+
+def blobs_to_matrix(blobs: list[bytes], dtypes: list[str], dim: int = 768) -> np.ndarray:
+    """
+    여러 BLOB을 (n, dim) float32 행렬로 변환.
+    dtype이 모두 같으면 한 번의 np.frombuffer로 처리한다.
+    """
+    if not blobs:
+        return np.zeros((0, dim), dtype='float32')
+    if len(set(dtypes)) == 1:
+        matrix = np.frombuffer(b"".join(blobs), dtype=dtypes[0]).reshape(len(blobs), dim)
+        return matrix.astype('float32', copy=False)
+    return np.stack([blob_to_vector(blob, dtype) for blob, dtype in zip(blobs, dtypes)])
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """벡터(1차원) 또는 행렬(행 단위)을 L2 정규화 (0벡터는 그대로 0)"""
+    vectors = np.asarray(vectors, dtype='float32')
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
 def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     """두 벡터 간의 코사인 유사도 계산"""
     dot_product = np.dot(vec1, vec2)
@@ -42,4 +53,29 @@ def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     if norm1 == 0 or norm2 == 0:
         return 0.0
     
-    return dot_product / (norm1 * norm2) 
\ No newline at end of file
+    return dot_product / (norm1 * norm2) 
+
+def top_k_similar(queries: np.ndarray, matrix: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    쿼리 벡터(1개 또는 여러 개)와 정규화된 행렬의 각 행 사이 코사인 유사도를
+    한 번의 행렬곱으로 계산하고, argpartition 으로 상위 k개만 골라 내림차순 정렬.
+    반환: (행 인덱스, 유사도) - 쿼리가 1차원이면 (k,), 2차원이면 (m, k)
+    """
+    single = np.ndim(queries) == 1
+    q = normalize(np.atleast_2d(queries))
+    n = matrix.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.zeros((q.shape[0], 0))
+        return (empty[0].astype('int64'), empty[0]) if single else (empty.astype('int64'), empty)
+
+    scores = q @ matrix.T
+    if k < n:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(n), scores.shape)
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    indices = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    return (indices[0], top_scores[0]) if single else (indices, top_scores)
@@ -0,0 +1,115 @@
+import asyncio
+import os
+from sqlalchemy import select, update
+from backend.db import get_session
+from backend.models import Post
+
+# 0 이면 조회마다 바로 UPDATE, 0보다 크면 그 간격(초)마다 누적된 증가분을 한 번에 반영
+VIEW_FLUSH_INTERVAL = float(os.environ.get("VIEW_FLUSH_INTERVAL", "0"))
+
+class ViewCounter :
+    """
+    게시글 조회수 증가.
+    기본은 UPDATE posts SET views = views + 1 ... RETURNING views 한 번으로 원자적으로 증가시키고,
+    flush_interval > 0 이면 증가분을 메모리에 모았다가 주기적으로 게시글별 합계만 반영한다.
+    버퍼 모드에서도 반환하는 조회수는 (마지막으로 읽은 DB 값 + 반영 중인 증가분 + 아직 반영 안 된 증가분) 이다.
+    """
+
+    def __init__(self, flush_interval : float = 0) :
+
+        self.flush_interval = flush_interval
+        self._pending : dict[int, int] = {}  # post_id -> 아직 DB 에 반영 안 된 증가분
+        self._inflight : dict[int, int] = {} # post_id -> flush 중이라 아직 commit 되지 않은 증가분
+        self._base : dict[int, int] = {}     # post_id -> 마지막으로 읽은 DB 조회수
+
+    @property
+    def buffered(self) :
+        return self.flush_interval > 0
+
+    def pending(self, post_id : int) -> int :
+        """DB 에서 읽은 조회수에 더해야 할 증가분 (commit 전인 flush 분 포함)"""
+        return self._inflight.get(post_id, 0) + self._pending.get(post_id, 0)
+
+    def current(self, post_id : int, db_views : int) -> int :
+        """
+        조회 시 돌려줄 조회수. 버퍼에 기준값이 있으면 메모리 값만으로 계산해
+        (DB 를 읽은 직후 flush 가 commit 되어도) increment 가 반환한 값보다 작아지지 않게 한다.
+        """
+        if post_id in self._base :
+            return max(db_views, self._base[post_id] + self.pending(post_id))
+        return db_views + self.pending(post_id)
+
+    async def increment(self, post_id : int) :
+        """조회수 1 증가 후 현재 조회수 반환 (게시글이 없으면 None)"""
+        if not self.buffered :
+            async for session in get_session() :
+                result = await session.execute(
+                    update(Post).where(Post.post_id == post_id)
+                    .values(views = Post.views + 1)
+                    .returning(Post.views)
+                )
+                views = result.scalar()
+                await session.commit()
+                return views
+
+        if post_id not in self._base :
+            async for session in get_session() :
+                views = (await session.execute(
+                    select(Post.views).where(Post.post_id == post_id)
+                )).scalar()
+            if views is None :
+                return None
+            self._base.setdefault(post_id, views)
+        self._pending[post_id] = self._pending.get(post_id, 0) + 1
+        return self._base[post_id] + self.pending(post_id)
+
+    def forget(self, post_id : int) :
+        """삭제된 게시글의 버퍼 제거"""
+        self._pending.pop(post_id, None)
+        self._inflight.pop(post_id, None)
+        self._base.pop(post_id, None)
+
+    async def flush(self) :
+        """누적된 증가분을 한 트랜잭션으로 반영"""
+        if not self._pending or self._inflight :
+            return  # 이전 flush 가 아직 진행 중이면 다음 주기에
+        # commit 전까지는 _inflight 에 남겨 두어 반환 조회수가 줄어들지 않도록 함
+        pending, self._pending = self._pending, {}
+        self._inflight = dict(pending)
+        try :
+            async for session in get_session() :
+                flushed = {}
+                for post_id, delta in pending.items() :
+                    result = await session.execute(
+                        update(Post).where(Post.post_id == post_id)
+                        .values(views = Post.views + delta)
+                        .returning(Post.views)
+                    )
+                    flushed[post_id] = result.scalar()
+                await session.commit()
+                # commit 직후 (다른 await 없이) 기준값을 옮기고 반영 중 증가분을 비움
+                self._inflight = {}
+                for post_id, views in flushed.items() :
+                    if views is None or post_id not in self._base :
+                        self.forget(post_id)  # flush 도중 삭제된 게시글
+                    else :
+                        self._base[post_id] = views
+        except BaseException :
+            # 반영 실패(또는 취소)된 증가분은 다음 flush 에서 다시 시도
+            for post_id, delta in self._inflight.items() :
+                self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            self._inflight = {}
+            raise
+        print(f"조회수 반영: 게시글 {len(pending)}개, {sum(pending.values())}회")
+
+    async def run(self) :
+        """flush_interval 마다 flush (버퍼 모드에서만 lifespan 에서 실행)"""
+        while True :
+            await asyncio.sleep(self.flush_interval)
+            try :
+                await self.flush()
+            except Exception as e :
+                print(f"조회수 반영 실패: {e}")
+
+# 프로세스 전역 조회수 카운터
+view_counter = ViewCounter(flush_interval = VIEW_FLUSH_INTERVAL)
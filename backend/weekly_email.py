@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# 프로젝트 루트를 Python 경로에 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, func
+from backend.db import get_read_session
+from backend.models import Member, Post, PostTag
+from backend.vector_db import user_vectors
+from backend.vector_utils import top_k_similar
+from backend.tag_cache import tag_cache
+from backend.post_cache import post_cache
+
+def render_email(titles : list[str]) -> str :
+    return "이번 주 추천 게시글:\n" + "\n".join(titles)
+
+async def _member_batches(batch_size : int, user_ids = None) :
+    """member_id 순으로 batch_size 명씩 (user_ids 가 없으면 전체 회원을 keyset 으로 나눠 읽음)"""
+    if user_ids is not None :
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), batch_size) :
+            yield user_ids[start:start + batch_size]
+        return
+    last_id = 0
+    while True :
+        async for session in get_read_session() :
+            result = await session.execute(
+                select(Member.member_id).where(Member.member_id > last_id)
+                .order_by(Member.member_id).limit(batch_size)
+            )
+            batch = [row[0] for row in result.all()]
+        if not batch :
+            return
+        yield batch
+        last_id = batch[-1]
+
+async def _top_posts_by_tag(tag_ids : list[int], per_tag : int) -> dict[int, list[tuple[int, str]]] :
+    """태그별 (조회수, 작성일) 상위 per_tag 개 게시글을 한 번의 window 쿼리로 조회"""
+    if not tag_ids :
+        return {}
+    rn = func.row_number().over(
+        partition_by = PostTag.tag_id,
+        order_by = (Post.views.desc(), Post.created_at.desc())
+    ).label("rn")
+    ranked = (
+        select(PostTag.tag_id, Post.post_id, Post.title, rn)
+        .join(Post, Post.post_id == PostTag.post_id)
+        .where(PostTag.tag_id.in_(tag_ids))
+        .subquery()
+    )
+    async for session in get_read_session() :
+        result = await session.execute(
+            select(ranked.c.tag_id, ranked.c.post_id, ranked.c.title)
+            .where(ranked.c.rn <= per_tag)
+            .order_by(ranked.c.tag_id, ranked.c.rn)
+        )
+        by_tag : dict[int, list[tuple[int, str]]] = {}
+        for tag_id, post_id, title in result.all() :
+            by_tag.setdefault(tag_id, []).append((post_id, title))
+        return by_tag
+
+async def generate_weekly_emails(user_ids = None, top_n : int = 5, batch_size : int = 256, tags_per_user : int = 3) :
+    """
+    여러 사용자의 주간 이메일을 batch_size 명씩 만들어 (user_id, 본문) 으로 yield.
+    배치마다 사용자 벡터 행렬과 태그 행렬을 한 번의 행렬곱으로 점수 매기고,
+    필요한 태그들의 후보 게시글을 한 번에 조회한다 (get_user_based_recs 와 같은 선택 규칙).
+    벡터가 없는 사용자는 인기 게시글로 대체.
+    """
+    tag_ids, _, tag_matrix = await tag_cache.get()
+    _, popular = await post_cache.get(top_n)
+    fallback = render_email([p["title"] for p in popular])
+
+    async for batch in _member_batches(batch_size, user_ids) :
+        vectors, found = user_vectors.get_embeddings(batch)
+        if len(tag_ids) == 0 or not found.any() :
+            for user_id in batch :
+                yield user_id, fallback
+            continue
+
+        rows, _ = top_k_similar(vectors[found], tag_matrix, tags_per_user)
+        user_tags = tag_ids[rows]  # (벡터가 있는 사용자 수, tags_per_user)
+        # 앞 태그에서 이미 고른 게시글을 건너뛰어도 top_n 을 채울 수 있도록 2배 조회
+        candidates = await _top_posts_by_tag(sorted(set(user_tags.ravel().tolist())), top_n * 2)
+
+        tags_by_user = dict(zip([u for u, f in zip(batch, found) if f], user_tags.tolist()))
+        for user_id in batch :
+            if user_id not in tags_by_user :
+                yield user_id, fallback
+                continue
+            picked : dict[int, str] = {}
+            for tag_id in tags_by_user[user_id] :
+                for post_id, title in candidates.get(tag_id, []) :
+                    if len(picked) >= top_n :
+                        break
+                    picked.setdefault(post_id, title)
+                if len(picked) >= top_n :
+                    break
+            yield user_id, render_email(list(picked.values()))
+
+async def send_weekly_emails(user_ids = None, top_n : int = 5, batch_size : int = 256, out = None) :
+    """주간 이메일 전체 실행 - out 이 있으면 JSON lines 로 기록하고, 진행 상황을 출력"""
+    t0 = time.perf_counter()
+    count = 0
+    async for user_id, body in generate_weekly_emails(user_ids, top_n, batch_size) :
+        if out is not None :
+            out.write(json.dumps({"user_id" : user_id, "body" : body}, ensure_ascii = False) + "\n")
+        count += 1
+        if count % batch_size == 0 :
+            print(f"주간 이메일 생성 중: {count}명 ({time.perf_counter() - t0:.1f}s)")
+    print(f"주간 이메일 생성 완료: {count}명 ({time.perf_counter() - t0:.1f}s)")
+    return count
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "전체 회원 주간 이메일 생성")
+    parser.add_argument("--out", default = "weekly_emails.jsonl", help = "결과 JSON lines 파일")
+    parser.add_argument("--top-n", type = int, default = 5)
+    parser.add_argument("--batch-size", type = int, default = 256)
+    args = parser.parse_args()
+
+    from backend.vector_db import vector_store
+    vector_store.load()
+    with open(args.out, "w", encoding = "utf-8") as f :
+        asyncio.run(send_weekly_emails(top_n = args.top_n, batch_size = args.batch_size, out = f))